@@ -56,7 +56,6 @@ from subprocess import Popen
 
 
 import collections.abc
-import ctypes
 import datetime
 import os
 import shutil
@@ -136,13 +135,11 @@ class PortableDevice:
         IOError: If something went wrong
     """
 
-    def __init__(
-        self, device: "str | ctypes._Pointer[pylibmtp.LIBMTP_RawDevice]"  # pyright: ignore[reportPrivateUsage]
-    ) -> None:
+    def __init__(self, device: "str | pylibmtp.LIBMTP_RawDevice") -> None:
         """Init the class.
 
         Parameters:
-           device: Linux path to the device on Gnome or a libmtp device pointer on KDE
+           device: Linux path to the device on Gnome or a libmtp raw device on KDE
         """
         self.description: str = "Unknown"
         self.name: str = "Unknown"
@@ -338,22 +335,20 @@ class PortableDeviceContent:
         else:
             if _libmtp is None:
                 return
-            for entry in self._port_device.libmntp_device.get_files_and_folder(self.storage_id, self.entry_id):
+            listing = self._port_device.libmntp_device.get_files_and_folder(self.storage_id, self.entry_id)
+            folder_type: int = pylibmtp.LIBMTP_Filetype.FOLDER
+            for i, entry_filename in enumerate(listing.filename):
                 type: Literal[1, 2] = (
-                    WPD_CONTENT_TYPE_DIRECTORY
-                    if entry.filetype == pylibmtp.LIBMTP_Filetype["FOLDER"].value  # pyright: ignore[reportAny]
-                    else WPD_CONTENT_TYPE_FILE
+                    WPD_CONTENT_TYPE_DIRECTORY if listing.filetype[i] == folder_type else WPD_CONTENT_TYPE_FILE
                 )
                 yield PortableDeviceContent(
                     port_device=self._port_device,
-                    dirpath=os.path.join(
-                        self.full_filename, entry.filename.decode("utf-8")  # pyright: ignore[reportAny]
-                    ),
+                    dirpath=os.path.join(self.full_filename, entry_filename),
                     storage_id=self.storage_id,
-                    entry_id=entry.item_id,  # pyright: ignore[reportAny]
+                    entry_id=listing.item_id[i],
                     typ=type,
-                    size=entry.filesize,  # pyright: ignore[reportAny]
-                    date_modified=entry.modificationdate,  # pyright: ignore[reportAny]
+                    size=listing.filesize[i],
+                    date_modified=listing.modificationdate[i],
                 )
 
     def get_child(self, name: str) -> "PortableDeviceContent | None":
@@ -391,26 +386,25 @@ class PortableDeviceContent:
         else:
             if _libmtp is None:
                 return
-            for entry in self._port_device.libmntp_device.get_files_and_folder(self.storage_id, self.entry_id):
-                entry_filename = entry.filename.decode("UTF-8")  # pyright: ignore[reportAny]
-                if entry_filename != name:
-                    continue
-                # Ok found, so do a direct return
-                type: Literal[1, 2] = (
-                    WPD_CONTENT_TYPE_DIRECTORY
-                    if entry.filetype == pylibmtp.LIBMTP_Filetype["FOLDER"].value  # pyright: ignore[reportAny]
-                    else WPD_CONTENT_TYPE_FILE
-                )
-                return PortableDeviceContent(
-                    self._port_device,
-                    os.path.join(self.full_filename, entry_filename),  # pyright: ignore[reportAny]
-                    self.storage_id,
-                    entry.item_id,  # pyright: ignore[reportAny]
-                    type,
-                    entry.filesize,  # pyright: ignore[reportAny]
-                    entry.modificationdate,  # pyright: ignore[reportAny]
-                )
-            return None
+            listing = self._port_device.libmntp_device.get_files_and_folder(self.storage_id, self.entry_id)
+            try:
+                i = listing.filename.index(name)
+            except ValueError:
+                return None
+            type: Literal[1, 2] = (
+                WPD_CONTENT_TYPE_DIRECTORY
+                if listing.filetype[i] == pylibmtp.LIBMTP_Filetype.FOLDER
+                else WPD_CONTENT_TYPE_FILE
+            )
+            return PortableDeviceContent(
+                self._port_device,
+                os.path.join(self.full_filename, name),
+                self.storage_id,
+                listing.item_id[i],
+                type,
+                listing.filesize[i],
+                listing.modificationdate[i],
+            )
 
     def get_path(self, path: str) -> "PortableDeviceContent | None":
         """Returns a PortableDeviceContent for a child who's path in the tree is known.
@@ -31,7 +31,8 @@ Example Usage (or see examples/):
 #pyright: basic
 
 from __future__ import annotations
-from typing import Any, override
+from typing import Any, Callable, Iterator, override
+from collections.abc import Buffer
 
 __VERSION__ = "0.0.6"
 __VERSION_MACRO__ = 5
@@ -43,13 +44,27 @@ __LICENSE__ = "GPL-3"
 __DEBUG__ = 1
 
 import os
+import stat
+import array
+import collections
+import contextlib
+import functools
+import itertools
+import operator
+import threading
+import time
+import weakref
 import ctypes
 import ctypes.util
+from dataclasses import dataclass, field
+from enum import IntEnum
 
 
 # NOTE: This code *may* work on windows, I don't have a win32 system to test
 # this on.
 _module_path = ctypes.util.find_library("mtp")
+# This must stay a CDLL and not a PyDLL: CDLL releases the GIL for the duration
+# of every libmtp call, so other Python threads keep running during USB transfers.
 _libmtp = ctypes.CDLL(_module_path)
 
 
@@ -122,9 +137,11 @@ class LIBMTP_Error(ctypes.Structure):
     Contains the ctypes structure for LIBMTP_error_t
     """
 
+    __slots__ = ()
+
     @override
     def __repr__(self) -> str:
-        return self.errornumber
+        return f"<LIBMTP_Error errno={self.errornumber}>"
 
 
 LIBMTP_Error._fields_ = [
@@ -140,9 +157,11 @@ class LIBMTP_DeviceStorage(ctypes.Structure):
     Contains the ctypes structure for LIBMTP_devicestorage_t
     """
 
+    __slots__ = ()
+
     @override
     def __repr__(self) -> str:
-        return self.id
+        return f"<Storage id={self.id}>"
 
 
 LIBMTP_DeviceStorage._fields_ = [
@@ -166,9 +185,11 @@ class LIBMTP_DeviceEntry(ctypes.Structure):
     Contains the ctypes structure for LIBMTP_device_entry_t
     """
 
+    __slots__ = ()
+
     @override
     def __repr__(self) -> str:
-        return self.vendor
+        return f"<Device {self.vendor!r}>"
 
 
 LIBMTP_DeviceEntry._fields_ = [
@@ -186,9 +207,11 @@ class LIBMTP_RawDevice(ctypes.Structure):
     Contains the ctypes structure for LIBMTP_raw_device_t
     """
 
+    __slots__ = ()
+
     @override
     def __repr__(self) -> str:
-        return self.device_entry
+        return f"<RawDevice {self.device_entry.vendor!r} bus={self.bus_location} dev={self.devnum}>"
 
 
 LIBMTP_RawDevice._fields_ = [
@@ -204,9 +227,11 @@ class LIBMTP_MTPDevice(ctypes.Structure):
     Contains the ctypes structure for LIBMTP_mtpdevice_t
     """
 
+    __slots__ = ()
+
     @override
     def __repr__(self) -> str:
-        return self.interface_number
+        return f"<MTPDevice interface={self.interface_number}>"
 
 
 LIBMTP_MTPDevice._fields_ = [
@@ -235,6 +260,8 @@ class LIBMTP_File(ctypes.Structure):
     Contains the ctypes structure for LIBMTP_file_t
     """
 
+    __slots__ = ()
+
     @override
     def __repr__(self):
         return "%s (%s)" % (self.filename, self.item_id)
@@ -252,12 +279,76 @@ LIBMTP_File._fields_ = [
 ]
 
 
+@dataclass(slots=True)
+class FileListing:
+    """
+    FileListing
+    Python owned copy of a LIBMTP_file_t list, stored column by column.
+    Entry i of the listing is made of the i-th element of every column.
+    """
+
+    item_id: array.array[int] = field(default_factory=lambda: array.array("I"))
+    parent_id: array.array[int] = field(default_factory=lambda: array.array("I"))
+    storage_id: array.array[int] = field(default_factory=lambda: array.array("I"))
+    filetype: array.array[int] = field(default_factory=lambda: array.array("i"))
+    filesize: array.array[int] = field(default_factory=lambda: array.array("Q"))
+    modificationdate: array.array[int] = field(default_factory=lambda: array.array("Q"))
+    filename: list[str] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.filename)
+
+    def records(self) -> ctypes.Array[LIBMTP_FileRecord]:
+        """
+        Returns the integer columns as one contiguous array of
+        LIBMTP_FileRecord, built row by row from the columns. The array
+        supports the buffer protocol, so e.g. numpy.frombuffer(listing.records(),
+        dtype=...) can use it as a structured array. The filenames are not
+        part of the records.
+
+        @rtype: ctypes array of LIBMTP_FileRecord
+        @return: One record per entry, in the order of the listing
+        """
+
+        columns = operator.attrgetter(*_FILE_RECORD_FIELDS)(self)
+        return (LIBMTP_FileRecord * len(self))(*zip(*columns))
+
+
+class LIBMTP_FileRecord(ctypes.Structure):
+    """
+    LIBMTP_FileRecord
+    Contains the integer fields of a LIBMTP_file_t as a flat record
+    without pointers, see FileListing.records()
+    """
+
+    __slots__ = ()
+
+    _fields_ = [
+        ("item_id", ctypes.c_uint32),
+        ("parent_id", ctypes.c_uint32),
+        ("storage_id", ctypes.c_uint32),
+        ("filesize", ctypes.c_uint64),
+        ("modificationdate", ctypes.c_uint64),
+        ("filetype", ctypes.c_int),
+    ]
+
+    @override
+    def __repr__(self):
+        return f"<FileRecord id={self.item_id} parent={self.parent_id} filetype={self.filetype}>"
+
+
+# Must be in the order of LIBMTP_FileRecord._fields_, records() fills the records positionally
+_FILE_RECORD_FIELDS = ("item_id", "parent_id", "storage_id", "filesize", "modificationdate", "filetype")
+
+
 class LIBMTP_Track(ctypes.Structure):
     """
     LIBMTP_Track
     Contains the ctypes structure for LIBMTP_track_t
     """
 
+    __slots__ = ()
+
     @override
     def __repr__(self):
         return "%s - %s (%s)" % (self.artist, self.title, self.item_id)
@@ -296,6 +387,8 @@ class LIBMTP_Folder(ctypes.Structure):
     Contains the ctypes structure for LIBMTP_folder_t
     """
 
+    __slots__ = ()
+
     @override
     def __repr__(self):
         return "%s (%s)" % (self.name, self.folder_id)
@@ -310,68 +403,303 @@ LIBMTP_Folder._fields_ = [
     ("child", ctypes.POINTER(LIBMTP_Folder)),
 ]
 
+
+@dataclass(slots=True)
+class Folders:
+    """
+    Folders
+    Python owned copy of a LIBMTP_folder_t tree, stored column by column.
+    Entry i is made of the i-th element of every column, by_id maps a
+    folder id to its entry. The names are kept as the UTF-8 bytes from
+    libmtp and only decoded when they are read.
+    """
+
+    folder_id: array.array[int] = field(default_factory=lambda: array.array("I"))
+    parent_id: array.array[int] = field(default_factory=lambda: array.array("I"))
+    storage_id: array.array[int] = field(default_factory=lambda: array.array("I"))
+    raw_name: list[bytes] = field(default_factory=list)
+    by_id: dict[int, int] = field(default_factory=dict)
+
+    def __len__(self) -> int:
+        return len(self.raw_name)
+
+    @property
+    def name(self) -> list[str]:
+        """
+        The decoded folder names. They are decoded from raw_name on
+        every access, so they always match it.
+        """
+        return [name.decode("UTF-8") for name in self.raw_name]
+
+    def find(self, folder_id: int) -> tuple[int, int, int, str]:
+        """
+        Returns the folder with the id folder_id. This takes the
+        place of LIBMTP_Find_Folder, which scans the whole tree.
+
+        @type folder_id: int
+        @param folder_id: The id of the folder
+        @rtype: tuple
+        @return: The tuple (folder_id, parent_id, storage_id, name)
+        """
+
+        index = self.by_id.get(folder_id)
+        if index is None:
+            raise ObjectNotFound
+        return folder_id, self.parent_id[index], self.storage_id[index], self.raw_name[index].decode("UTF-8")
+
+    def path(self, folder_id: int) -> list[str]:
+        """
+        Returns the names of the folders from the top level folder
+        down to the folder with the id folder_id. The parents are
+        found through by_id, no call to libmtp is needed.
+
+        @type folder_id: int
+        @param folder_id: The id of the folder
+        @rtype: list
+        @return: The folder names, the top level folder first
+        """
+
+        index = self.by_id.get(folder_id)
+        if index is None:
+            raise ObjectNotFound
+        names: list[str] = []
+        # A parent that is not in the listing ends the path, as does a loop
+        while index is not None and len(names) < len(self):
+            names.append(self.raw_name[index].decode("UTF-8"))
+            index = self.by_id.get(self.parent_id[index])
+        names.reverse()
+        return names
+
+
+class LIBMTP_Playlist(ctypes.Structure):
+    """
+    LIBMTP_Playlist
+    Contains the ctypes structure for LIBMTP_playlist_t
+    """
+
+    # Number of track ids the tracks buffer can hold
+    __slots__ = ("_capacity",)
+
+    def __init__(self):
+        super().__init__()
+        self.tracks = ctypes.pointer(ctypes.c_uint32(0))
+        self.no_tracks = 0
+        self._capacity = 1
+
+    @override
+    def __repr__(self):
+        return "%s (%s)" % (self.name, self.playlist_id)
+
+    def __iter__(self) -> Iterator[int]:
+        """
+        This allows the playlist object to act like a list.
+        The tracks are read in one go through an array view
+        of the tracks buffer, iterating works on that copy.
+        """
+        if not self.no_tracks or not self.tracks:
+            return iter(())
+        view = (ctypes.c_uint32 * self.no_tracks).from_address(ctypes.addressof(self.tracks.contents))
+        return iter(view[:])
+
+    def __getitem__(self, key: int) -> int:
+        """
+        This allows the playlist to return tracks like a list
+        """
+
+        if key < 0 or key > (self.no_tracks - 1):
+            raise IndexError
+
+        return self.tracks[key]
+
+    def __setitem__(self, key: int, value: int) -> None:
+        """
+        This allows the user to manipulate the playlist like a
+        list. However, this will only modify existing objects,
+        you can't try to set a key outside of the current size.
+        """
+
+        if key < 0 or key > (self.no_tracks - 1):
+            raise IndexError
+
+        self.tracks[key] = value
+
+    def __delitem__(self, key: int) -> None:
+        """
+        This allows the user to delete an object
+        from the playlist
+        """
+
+        if key < 0 or key > (self.no_tracks - 1):
+            raise IndexError
+
+        # Move the following tracks one position to the front with one copy
+        item_size = ctypes.sizeof(ctypes.c_uint32)
+        dst = ctypes.addressof(self.tracks.contents) + key * item_size
+        ctypes.memmove(dst, dst + item_size, (self.no_tracks - key - 1) * item_size)
+        self.no_tracks -= 1
+
+    def append(self, value: int) -> None:
+        """
+        This function appends a track to the end of the tracks
+        list. When the tracks buffer is full it is replaced by one
+        of twice the size, so appending is amortized O(1).
+        """
+        # Playlists read from libmtp have no spare room
+        capacity = getattr(self, "_capacity", self.no_tracks) if self.tracks else 0
+        if self.no_tracks >= capacity:
+            capacity = max(1, capacity * 2)
+            buffer = (ctypes.c_uint32 * capacity)()
+            if self.no_tracks:
+                ctypes.memmove(buffer, self.tracks, self.no_tracks * ctypes.sizeof(ctypes.c_uint32))
+            self.tracks = ctypes.cast(buffer, ctypes.POINTER(ctypes.c_uint32))
+            self._capacity = capacity
+
+        self.tracks[self.no_tracks] = value
+        self.no_tracks += 1
+
+    def __len__(self) -> int:
+        """
+        This returns the number of tracks in the playlist
+        """
+
+        return self.no_tracks
+
+
+LIBMTP_Playlist._fields_ = [
+    ("playlist_id", ctypes.c_uint32),
+    ("parent_id", ctypes.c_uint32),
+    ("storage_id", ctypes.c_uint32),
+    ("name", ctypes.c_char_p),
+    ("tracks", ctypes.POINTER(ctypes.c_uint32)),
+    ("no_tracks", ctypes.c_uint32),
+    ("next", ctypes.POINTER(LIBMTP_Playlist)),
+]
+
 # Abstracted from libmtp's LIBMTP_filetype_t. This must be kept in sync.
 #  first checked in 0.2.6.1
 #  last checked in version 1.1.6
-LIBMTP_Filetype = {
-    "FOLDER": ctypes.c_int(0),
-    "WAV": ctypes.c_int(1),
-    "MP3": ctypes.c_int(2),
-    "WMA": ctypes.c_int(3),
-    "OGG": ctypes.c_int(4),
-    "AUDIBLE": ctypes.c_int(5),
-    "MP4": ctypes.c_int(6),
-    "UNDEF_AUDIO": ctypes.c_int(7),
-    "WMV": ctypes.c_int(8),
-    "AVI": ctypes.c_int(9),
-    "MPEG": ctypes.c_int(10),
-    "ASF": ctypes.c_int(11),
-    "QT": ctypes.c_int(12),
-    "UNDEF_VIDEO": ctypes.c_int(13),
-    "JPEG": ctypes.c_int(14),
-    "JFIF": ctypes.c_int(15),
-    "TIFF": ctypes.c_int(16),
-    "BMP": ctypes.c_int(17),
-    "GIF": ctypes.c_int(18),
-    "PICT": ctypes.c_int(19),
-    "PNG": ctypes.c_int(20),
-    "VCALENDAR1": ctypes.c_int(21),
-    "VCALENDAR2": ctypes.c_int(22),
-    "VCARD2": ctypes.c_int(23),
-    "VCARD3": ctypes.c_int(24),
-    "WINDOWSIMAGEFORMAT": ctypes.c_int(25),
-    "WINEXEC": ctypes.c_int(26),
-    "TEXT": ctypes.c_int(27),
-    "HTML": ctypes.c_int(28),
-    "FIRMWARE": ctypes.c_int(29),
-    "AAC": ctypes.c_int(30),
-    "MEDIACARD": ctypes.c_int(31),
-    "FLAC": ctypes.c_int(32),
-    "MP2": ctypes.c_int(33),
-    "M4A": ctypes.c_int(34),
-    "DOC": ctypes.c_int(35),
-    "XML": ctypes.c_int(36),
-    "XLS": ctypes.c_int(37),
-    "PPT": ctypes.c_int(38),
-    "MHT": ctypes.c_int(39),
-    "JP2": ctypes.c_int(40),
-    "JPX": ctypes.c_int(41),
-    "ALBUM": ctypes.c_int(42),
-    "PLAYLIST": ctypes.c_int(43),
-    "UNKNOWN": ctypes.c_int(44),
+LIBMTP_Filetype = IntEnum(
+    "LIBMTP_Filetype",
+    {
+        "FOLDER": 0,
+        "WAV": 1,
+        "MP3": 2,
+        "WMA": 3,
+        "OGG": 4,
+        "AUDIBLE": 5,
+        "MP4": 6,
+        "UNDEF_AUDIO": 7,
+        "WMV": 8,
+        "AVI": 9,
+        "MPEG": 10,
+        "ASF": 11,
+        "QT": 12,
+        "UNDEF_VIDEO": 13,
+        "JPEG": 14,
+        "JFIF": 15,
+        "TIFF": 16,
+        "BMP": 17,
+        "GIF": 18,
+        "PICT": 19,
+        "PNG": 20,
+        "VCALENDAR1": 21,
+        "VCALENDAR2": 22,
+        "VCARD2": 23,
+        "VCARD3": 24,
+        "WINDOWSIMAGEFORMAT": 25,
+        "WINEXEC": 26,
+        "TEXT": 27,
+        "HTML": 28,
+        "FIRMWARE": 29,
+        "AAC": 30,
+        "MEDIACARD": 31,
+        "FLAC": 32,
+        "MP2": 33,
+        "M4A": 34,
+        "DOC": 35,
+        "XML": 36,
+        "XLS": 37,
+        "PPT": 38,
+        "MHT": 39,
+        "JP2": 40,
+        "JPX": 41,
+        "ALBUM": 42,
+        "PLAYLIST": 43,
+        "UNKNOWN": 44,
+    },
+)
+
+# Maps the lowercase file extensions to their filetype as plain int, used by MTP.find_filetype
+_EXT_TO_FILETYPE: dict[str, int] = {
+    "wav": int(LIBMTP_Filetype.WAV),
+    "wave": int(LIBMTP_Filetype.WAV),
+    "mp3": int(LIBMTP_Filetype.MP3),
+    "wma": int(LIBMTP_Filetype.WMA),
+    "ogg": int(LIBMTP_Filetype.OGG),
+    "mp4": int(LIBMTP_Filetype.MP4),
+    "wmv": int(LIBMTP_Filetype.WMV),
+    "avi": int(LIBMTP_Filetype.AVI),
+    "mpeg": int(LIBMTP_Filetype.MPEG),
+    "mpg": int(LIBMTP_Filetype.MPEG),
+    "asf": int(LIBMTP_Filetype.ASF),
+    "qt": int(LIBMTP_Filetype.QT),
+    "mov": int(LIBMTP_Filetype.QT),
+    "jpeg": int(LIBMTP_Filetype.JPEG),
+    "jpg": int(LIBMTP_Filetype.JPEG),
+    "jfif": int(LIBMTP_Filetype.JFIF),
+    "tif": int(LIBMTP_Filetype.TIFF),
+    "tiff": int(LIBMTP_Filetype.TIFF),
+    "bmp": int(LIBMTP_Filetype.BMP),
+    "gif": int(LIBMTP_Filetype.GIF),
+    "pic": int(LIBMTP_Filetype.PICT),
+    "pict": int(LIBMTP_Filetype.PICT),
+    "png": int(LIBMTP_Filetype.PNG),
+    "wmf": int(LIBMTP_Filetype.WINDOWSIMAGEFORMAT),
+    "ics": int(LIBMTP_Filetype.VCALENDAR2),
+    "exe": int(LIBMTP_Filetype.WINEXEC),
+    "com": int(LIBMTP_Filetype.WINEXEC),
+    "bat": int(LIBMTP_Filetype.WINEXEC),
+    "dll": int(LIBMTP_Filetype.WINEXEC),
+    "sys": int(LIBMTP_Filetype.WINEXEC),
+    "aac": int(LIBMTP_Filetype.AAC),
+    "mp2": int(LIBMTP_Filetype.MP2),
+    "flac": int(LIBMTP_Filetype.FLAC),
+    "m4a": int(LIBMTP_Filetype.M4A),
+    "doc": int(LIBMTP_Filetype.DOC),
+    "xml": int(LIBMTP_Filetype.XML),
+    "xls": int(LIBMTP_Filetype.XLS),
+    "ppt": int(LIBMTP_Filetype.PPT),
+    "mht": int(LIBMTP_Filetype.MHT),
+    "jp2": int(LIBMTP_Filetype.JP2),
+    "jpx": int(LIBMTP_Filetype.JPX),
 }
+_UNKNOWN_FILETYPE = int(LIBMTP_Filetype.UNKNOWN)
 
 # Synced from libmtp 0.2.6.1's libmtp.h. Must be kept in sync.
-LIBMTP_Error_Number = {
-    "NONE": ctypes.c_int(0),
-    "GENERAL": ctypes.c_int(1),
-    "PTP_LAYER": ctypes.c_int(2),
-    "USB_LAYER": ctypes.c_int(3),
-    "MEMORY_ALLOCATION": ctypes.c_int(4),
-    "NO_DEVICE_ATTACHED": ctypes.c_int(5),
-    "STORAGE_FULL": ctypes.c_int(6),
-    "CONNECTING": ctypes.c_int(7),
-    "CANCELLED": ctypes.c_int(8),
+LIBMTP_Error_Number = IntEnum(
+    "LIBMTP_Error_Number",
+    {
+        "NONE": 0,
+        "GENERAL": 1,
+        "PTP_LAYER": 2,
+        "USB_LAYER": 3,
+        "MEMORY_ALLOCATION": 4,
+        "NO_DEVICE_ATTACHED": 5,
+        "STORAGE_FULL": 6,
+        "CONNECTING": 7,
+        "CANCELLED": 8,
+    },
+)
+
+# Maps the errors returned by LIBMTP_Detect_Raw_Devices to the exception raised for them.
+# NO_DEVICE_ATTACHED and STORAGE_FULL are no errors when detecting devices.
+_ERR_DISPATCH: dict[int, tuple[type[Exception], str]] = {
+    LIBMTP_Error_Number.GENERAL: (CommandFailed, "GENERAL"),
+    LIBMTP_Error_Number.PTP_LAYER: (CommandFailed, "PTP_LAYER"),
+    LIBMTP_Error_Number.USB_LAYER: (CommandFailed, "USB_LAYER"),
+    LIBMTP_Error_Number.MEMORY_ALLOCATION: (CommandFailed, "MEMORY_ALLOCATION"),
+    LIBMTP_Error_Number.CONNECTING: (AlreadyConnected, "CONNECTING"),
+    LIBMTP_Error_Number.CANCELLED: (CommandFailed, "CANCELLED"),
 }
 
 LIBMTP_FILES_AND_FOLDERS_ROOT = 0xFFFFFFFF
@@ -383,7 +711,39 @@ LIBMTP_FILES_AND_FOLDERS_ROOT = 0xFFFFFFFF
 # ----------
 # Type Definitions
 # ----------
+# This is for callbacks with the type of LIBMTP_progressfunc_t:
+# int (*)(uint64_t sent, uint64_t total, void const *data), a non zero return cancels the transfer
+Progressfunc = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_uint64, ctypes.c_uint64, ctypes.c_void_p)
+# A NULL callback, passed when no progress is wanted
+_no_progress = Progressfunc()
+# Default throttling of the progress callbacks, see _wrap_progress
+PROGRESS_MIN_BYTES = 256 * 1024
+PROGRESS_MIN_INTERVAL_MS = 100
+# This is for the data source of LIBMTP_Send_File_From_Handler with the type of MTPDataGetFunc:
+# uint16_t (*)(void *params, void *priv, uint32_t wantlen, unsigned char *data, uint32_t *gotlen)
+MTPDataGetFunc = ctypes.CFUNCTYPE(
+    ctypes.c_uint16,
+    ctypes.c_void_p,
+    ctypes.c_void_p,
+    ctypes.c_uint32,
+    ctypes.c_void_p,
+    ctypes.POINTER(ctypes.c_uint32),
+)
+LIBMTP_HANDLER_RETURN_OK = 0
+LIBMTP_HANDLER_RETURN_ERROR = 1
+LIBMTP_HANDLER_RETURN_CANCEL = 2
+
+_libmtp.LIBMTP_Init.restype = None
+_libmtp.LIBMTP_Init.argtypes = []
+_libmtp.LIBMTP_Dump_Errorstack.restype = None
+_libmtp.LIBMTP_Dump_Errorstack.argtypes = [ctypes.POINTER(LIBMTP_MTPDevice)]
+_libmtp.LIBMTP_Clear_Errorstack.restype = None
+_libmtp.LIBMTP_Clear_Errorstack.argtypes = [ctypes.POINTER(LIBMTP_MTPDevice)]
 _libmtp.LIBMTP_Detect_Raw_Devices.restype = ctypes.c_int  # actually LIBMTP_Error_Number enum
+_libmtp.LIBMTP_Detect_Raw_Devices.argtypes = [
+    ctypes.POINTER(ctypes.POINTER(LIBMTP_RawDevice)),
+    ctypes.POINTER(ctypes.c_int),
+]
 _libmtp.LIBMTP_Create_Folder.restype = ctypes.c_int
 _libmtp.LIBMTP_Create_Folder.argtypes = [
     ctypes.POINTER(LIBMTP_MTPDevice),
@@ -392,37 +752,421 @@ _libmtp.LIBMTP_Create_Folder.argtypes = [
     ctypes.c_uint32,
 ]
 _libmtp.LIBMTP_Get_Friendlyname.restype = ctypes.c_char_p
+_libmtp.LIBMTP_Get_Friendlyname.argtypes = [ctypes.POINTER(LIBMTP_MTPDevice)]
 _libmtp.LIBMTP_Get_Serialnumber.restype = ctypes.c_char_p
+_libmtp.LIBMTP_Get_Serialnumber.argtypes = [ctypes.POINTER(LIBMTP_MTPDevice)]
 _libmtp.LIBMTP_Get_Modelname.restype = ctypes.c_char_p
+_libmtp.LIBMTP_Get_Modelname.argtypes = [ctypes.POINTER(LIBMTP_MTPDevice)]
 _libmtp.LIBMTP_Get_Manufacturername.restype = ctypes.c_char_p
+_libmtp.LIBMTP_Get_Manufacturername.argtypes = [ctypes.POINTER(LIBMTP_MTPDevice)]
 _libmtp.LIBMTP_Get_Deviceversion.restype = ctypes.c_char_p
+_libmtp.LIBMTP_Get_Deviceversion.argtypes = [ctypes.POINTER(LIBMTP_MTPDevice)]
 # Fue Could not find this function in libmtp documentation
 # _libmtp.LIBMTP_Get_Filelisting_With_Callback.restype = ctypes.POINTER(LIBMTP_File)
 _libmtp.LIBMTP_Get_Storage.restype = ctypes.c_int
+_libmtp.LIBMTP_Get_Storage.argtypes = [ctypes.POINTER(LIBMTP_MTPDevice), ctypes.c_int]
 _libmtp.LIBMTP_Get_Files_And_Folders.restype = ctypes.POINTER(LIBMTP_File)
 _libmtp.LIBMTP_Get_Files_And_Folders.argtypes = [
     ctypes.POINTER(LIBMTP_MTPDevice),
     ctypes.c_uint32,
     ctypes.c_uint32,
 ]
+_libmtp.LIBMTP_destroy_file_t.restype = None
+_libmtp.LIBMTP_destroy_file_t.argtypes = [ctypes.POINTER(LIBMTP_File)]
+_libmtp.LIBMTP_Send_File_From_File.restype = ctypes.c_int
+_libmtp.LIBMTP_Send_File_From_File.argtypes = [
+    ctypes.POINTER(LIBMTP_MTPDevice),
+    ctypes.c_char_p,
+    ctypes.POINTER(LIBMTP_File),
+    Progressfunc,
+    ctypes.c_void_p,
+]
+_libmtp.LIBMTP_Send_File_From_Handler.restype = ctypes.c_int
+_libmtp.LIBMTP_Send_File_From_Handler.argtypes = [
+    ctypes.POINTER(LIBMTP_MTPDevice),
+    MTPDataGetFunc,
+    ctypes.c_void_p,
+    ctypes.POINTER(LIBMTP_File),
+    Progressfunc,
+    ctypes.c_void_p,
+]
+_libmtp.LIBMTP_Get_File_To_File.restype = ctypes.c_int
+_libmtp.LIBMTP_Get_File_To_File.argtypes = [
+    ctypes.POINTER(LIBMTP_MTPDevice),
+    ctypes.c_uint32,
+    ctypes.c_char_p,
+    Progressfunc,
+    ctypes.c_void_p,
+]
+_libmtp.LIBMTP_Delete_Object.restype = ctypes.c_int
+_libmtp.LIBMTP_Delete_Object.argtypes = [ctypes.POINTER(LIBMTP_MTPDevice), ctypes.c_uint32]
 _libmtp.LIBMTP_Get_Tracklisting_With_Callback.restype = ctypes.POINTER(LIBMTP_Track)
+_libmtp.LIBMTP_Get_Tracklisting_With_Callback.argtypes = [
+    ctypes.POINTER(LIBMTP_MTPDevice),
+    Progressfunc,
+    ctypes.c_void_p,
+]
 _libmtp.LIBMTP_Get_Filetype_Description.restype = ctypes.c_char_p
+_libmtp.LIBMTP_Get_Filetype_Description.argtypes = [ctypes.c_int]
 _libmtp.LIBMTP_Get_Filemetadata.restype = ctypes.POINTER(LIBMTP_File)
+_libmtp.LIBMTP_Get_Filemetadata.argtypes = [ctypes.POINTER(LIBMTP_MTPDevice), ctypes.c_uint32]
 _libmtp.LIBMTP_Get_Trackmetadata.restype = ctypes.POINTER(LIBMTP_Track)
+_libmtp.LIBMTP_Get_Trackmetadata.argtypes = [ctypes.POINTER(LIBMTP_MTPDevice), ctypes.c_uint32]
 _libmtp.LIBMTP_Get_First_Device.restype = ctypes.POINTER(LIBMTP_MTPDevice)
+_libmtp.LIBMTP_Get_First_Device.argtypes = []
 _libmtp.LIBMTP_Open_Raw_Device_Uncached.restype = ctypes.POINTER(LIBMTP_MTPDevice)
-# _libmtp.LIBMTP_Get_Playlist_List.restype = ctypes.POINTER(LIBMTP_Playlist)
-# _libmtp.LIBMTP_Get_Playlist.restype = ctypes.POINTER(LIBMTP_Playlist)
+_libmtp.LIBMTP_Open_Raw_Device_Uncached.argtypes = [ctypes.POINTER(LIBMTP_RawDevice)]
+_libmtp.LIBMTP_Release_Device.restype = None
+_libmtp.LIBMTP_Release_Device.argtypes = [ctypes.POINTER(LIBMTP_MTPDevice)]
+_libmtp.LIBMTP_Get_Track_To_File.restype = ctypes.c_int
+_libmtp.LIBMTP_Get_Track_To_File.argtypes = [
+    ctypes.POINTER(LIBMTP_MTPDevice),
+    ctypes.c_uint32,
+    ctypes.c_char_p,
+    Progressfunc,
+    ctypes.c_void_p,
+]
+_libmtp.LIBMTP_Send_Track_From_File.restype = ctypes.c_int
+_libmtp.LIBMTP_Send_Track_From_File.argtypes = [
+    ctypes.POINTER(LIBMTP_MTPDevice),
+    ctypes.c_char_p,
+    ctypes.POINTER(LIBMTP_Track),
+    Progressfunc,
+    ctypes.c_void_p,
+]
+_libmtp.LIBMTP_destroy_track_t.restype = None
+_libmtp.LIBMTP_destroy_track_t.argtypes = [ctypes.POINTER(LIBMTP_Track)]
+_libmtp.LIBMTP_Get_Playlist_List.restype = ctypes.POINTER(LIBMTP_Playlist)
+_libmtp.LIBMTP_Get_Playlist_List.argtypes = [ctypes.POINTER(LIBMTP_MTPDevice)]
+_libmtp.LIBMTP_Get_Playlist.restype = ctypes.POINTER(LIBMTP_Playlist)
+_libmtp.LIBMTP_Get_Playlist.argtypes = [ctypes.POINTER(LIBMTP_MTPDevice), ctypes.c_uint32]
+_libmtp.LIBMTP_Create_New_Playlist.restype = ctypes.c_int
+_libmtp.LIBMTP_Create_New_Playlist.argtypes = [ctypes.POINTER(LIBMTP_MTPDevice), ctypes.POINTER(LIBMTP_Playlist)]
+_libmtp.LIBMTP_Update_Playlist.restype = ctypes.c_int
+_libmtp.LIBMTP_Update_Playlist.argtypes = [ctypes.POINTER(LIBMTP_MTPDevice), ctypes.POINTER(LIBMTP_Playlist)]
+_libmtp.LIBMTP_destroy_playlist_t.restype = None
+_libmtp.LIBMTP_destroy_playlist_t.argtypes = [ctypes.POINTER(LIBMTP_Playlist)]
 _libmtp.LIBMTP_Get_Folder_List.restype = ctypes.POINTER(LIBMTP_Folder)
+_libmtp.LIBMTP_Get_Folder_List.argtypes = [ctypes.POINTER(LIBMTP_MTPDevice)]
 _libmtp.LIBMTP_Find_Folder.restype = ctypes.POINTER(LIBMTP_Folder)
+_libmtp.LIBMTP_Find_Folder.argtypes = [ctypes.POINTER(LIBMTP_Folder), ctypes.c_uint32]
+_libmtp.LIBMTP_destroy_folder_t.restype = None
+_libmtp.LIBMTP_destroy_folder_t.argtypes = [ctypes.POINTER(LIBMTP_Folder)]
 _libmtp.LIBMTP_Get_Errorstack.restype = ctypes.POINTER(LIBMTP_Error)
-# This is for callbacks with the type of LIBMTP_progressfunc_t
-Progressfunc = ctypes.CFUNCTYPE(ctypes.c_void_p, ctypes.c_uint64, ctypes.c_uint64)
+_libmtp.LIBMTP_Get_Errorstack.argtypes = [ctypes.POINTER(LIBMTP_MTPDevice)]
 
 # ----------
 # End Type Definitions
 # ----------
 
+# ----------
+# Function Handles
+# ----------
+# The libmtp functions used by the MTP class are looked up once at import.
+# The methods call these handles directly instead of resolving them on the
+# CDLL object with every call.
+_LIBMTP_Init = _libmtp.LIBMTP_Init
+_LIBMTP_Dump_Errorstack = _libmtp.LIBMTP_Dump_Errorstack
+_LIBMTP_Clear_Errorstack = _libmtp.LIBMTP_Clear_Errorstack
+_LIBMTP_Detect_Raw_Devices = _libmtp.LIBMTP_Detect_Raw_Devices
+_LIBMTP_Open_Raw_Device_Uncached = _libmtp.LIBMTP_Open_Raw_Device_Uncached
+_LIBMTP_Release_Device = _libmtp.LIBMTP_Release_Device
+_LIBMTP_Get_Friendlyname = _libmtp.LIBMTP_Get_Friendlyname
+_LIBMTP_Get_Modelname = _libmtp.LIBMTP_Get_Modelname
+_LIBMTP_Get_Serialnumber = _libmtp.LIBMTP_Get_Serialnumber
+_LIBMTP_Create_Folder = _libmtp.LIBMTP_Create_Folder
+# The transfer functions have no chunk size parameter. libmtp sizes the USB bulk
+# transfers itself from the device's endpoints and has no API to change that.
+_LIBMTP_Send_File_From_File = _libmtp.LIBMTP_Send_File_From_File
+_LIBMTP_Send_File_From_Handler = _libmtp.LIBMTP_Send_File_From_Handler
+_LIBMTP_Get_File_To_File = _libmtp.LIBMTP_Get_File_To_File
+_LIBMTP_Get_Track_To_File = _libmtp.LIBMTP_Get_Track_To_File
+_LIBMTP_Send_Track_From_File = _libmtp.LIBMTP_Send_Track_From_File
+_LIBMTP_Delete_Object = _libmtp.LIBMTP_Delete_Object
+_LIBMTP_Get_Files_And_Folders = _libmtp.LIBMTP_Get_Files_And_Folders
+_LIBMTP_destroy_file_t = _libmtp.LIBMTP_destroy_file_t
+_LIBMTP_Get_Filemetadata = _libmtp.LIBMTP_Get_Filemetadata
+_LIBMTP_Get_Storage = _libmtp.LIBMTP_Get_Storage
+_LIBMTP_Get_Folder_List = _libmtp.LIBMTP_Get_Folder_List
+_LIBMTP_destroy_folder_t = _libmtp.LIBMTP_destroy_folder_t
+_LIBMTP_Get_Playlist_List = _libmtp.LIBMTP_Get_Playlist_List
+_LIBMTP_destroy_playlist_t = _libmtp.LIBMTP_destroy_playlist_t
+_LIBMTP_Get_Playlist = _libmtp.LIBMTP_Get_Playlist
+_LIBMTP_Create_New_Playlist = _libmtp.LIBMTP_Create_New_Playlist
+_LIBMTP_Update_Playlist = _libmtp.LIBMTP_Update_Playlist
+_LIBMTP_Get_Trackmetadata = _libmtp.LIBMTP_Get_Trackmetadata
+_LIBMTP_destroy_track_t = _libmtp.LIBMTP_destroy_track_t
+
+# ----------
+# End Function Handles
+# ----------
+
+
+def _walk_linked_list(
+    node: Any,
+    fields: tuple[str, ...] | Callable[[Any], Any],
+    destroy: Callable[[Any], None] | None = None,
+    link: str = "next",
+) -> list[Any]:
+    """
+    Walks a libmtp linked list (LIBMTP_file_t, LIBMTP_track_t, LIBMTP_devicestorage_t, ...)
+    once along its link pointers and returns the values of fields for every node as tuple.
+    fields can also be a function that returns the value for a copy of the node.
+    If destroy is given every node is freed with it right after it has been copied.
+    """
+
+    struct_type = node._type_
+    if callable(fields):
+        get_values = fields
+    else:
+        get_fields = operator.attrgetter(*fields)
+        single = len(fields) == 1
+        get_values = (lambda entry: (get_fields(entry),)) if single else get_fields
+    get_link = operator.attrgetter(link)
+    ret: list[Any] = []
+    while node:
+        entry = struct_type.from_buffer_copy(node.contents)
+        ret.append(get_values(entry))
+        if destroy is not None:
+            destroy(node)
+        node = get_link(entry)
+    return ret
+
+
+def _walk_folder_tree(node: ctypes._Pointer[LIBMTP_Folder], fields: tuple[str, ...]) -> list[tuple[Any, ...]]:
+    """
+    Walks a LIBMTP_folder_t tree depth first in one pass and returns the values
+    of fields for every folder. The siblings still to visit are kept on a stack,
+    so no backtracking to the parents is needed.
+    """
+
+    get_fields = operator.attrgetter(*fields, "folder_id", "sibling", "child")
+    seen: set[int] = set()
+    ret: list[tuple[Any, ...]] = []
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        while node:
+            *values, folder_id, sibling, child = get_fields(node.contents)
+            if folder_id in seen:
+                node = sibling
+                continue
+            seen.add(folder_id)
+            ret.append(tuple(values))
+            if sibling:
+                stack.append(sibling)
+            node = child
+    return ret
+
+
+_FOLDER_FIELDS = ("folder_id", "parent_id", "storage_id", "name")
+
+
+def _folders_from_rows(rows: list[tuple[Any, ...]]) -> Folders:
+    """
+    Returns the folder rows read with _FOLDER_FIELDS as Folders.
+    """
+
+    folders = Folders()
+    if not rows:
+        return folders
+    folder_id, parent_id, storage_id, name = zip(*rows)
+    folders.folder_id.extend(folder_id)
+    folders.parent_id.extend(parent_id)
+    folders.storage_id.extend(storage_id)
+    folders.raw_name.extend(name)
+    folders.by_id.update(zip(folder_id, range(len(folder_id))))
+    return folders
+
+
+_FILE_LIST_FIELDS = ("item_id", "parent_id", "storage_id", "filetype", "filesize", "modificationdate", "filename")
+
+
+def _copy_file_list(node: ctypes._Pointer[LIBMTP_File], listing: FileListing) -> None:
+    """
+    Appends the values of a LIBMTP_file_t list to listing and frees the list.
+    """
+
+    rows = _walk_linked_list(node, _FILE_LIST_FIELDS, _LIBMTP_destroy_file_t)
+    if not rows:
+        return
+    item_id, parent_id, storage_id, filetype, filesize, modificationdate, filename = zip(*rows)
+    listing.item_id.extend(item_id)
+    listing.parent_id.extend(parent_id)
+    listing.storage_id.extend(storage_id)
+    listing.filetype.extend(filetype)
+    listing.filesize.extend(filesize)
+    listing.modificationdate.extend(modificationdate)
+    listing.filename.extend(name.decode("UTF-8") for name in filename)
+
+
+_TRACK_FIELDS = tuple(name for name, _ in LIBMTP_Track._fields_ if name != "next")
+_PLAYLIST_FIELDS = ("playlist_id", "parent_id", "storage_id", "name")
+
+
+def _struct_to_dict(entry: ctypes.Structure, fields: tuple[str, ...]) -> dict[str, Any]:
+    """
+    Returns the values of fields of entry as a dict, strings are decoded.
+    """
+
+    return {
+        name: value.decode("UTF-8") if isinstance(value, bytes) else value
+        for name, value in zip(fields, operator.attrgetter(*fields)(entry))
+    }
+
+
+def _copy_playlist(playlist: LIBMTP_Playlist) -> LIBMTP_Playlist:
+    """
+    Returns a copy of a playlist read from libmtp that owns its name and
+    tracks, so it stays valid after the libmtp playlist has been freed.
+    """
+
+    copy = LIBMTP_Playlist()
+    copy.playlist_id = playlist.playlist_id
+    copy.parent_id = playlist.parent_id
+    copy.storage_id = playlist.storage_id
+    copy.name = playlist.name
+    capacity = max(1, playlist.no_tracks)
+    buffer = (ctypes.c_uint32 * capacity)()
+    if playlist.no_tracks and playlist.tracks:
+        ctypes.memmove(buffer, playlist.tracks, playlist.no_tracks * ctypes.sizeof(ctypes.c_uint32))
+        copy.no_tracks = playlist.no_tracks
+    copy.tracks = ctypes.cast(buffer, ctypes.POINTER(ctypes.c_uint32))
+    copy._capacity = capacity
+    return copy
+
+
+# Throttle state [last_sent, last_time] of every running transfer, keyed by the
+# token that is passed to libmtp as the data argument of the progress callback
+_progress_state: dict[int, list[Any]] = {}
+_progress_tokens = itertools.count(1)
+
+
+# Progressfunc trampolines of the callbacks in use, per (min_bytes, min_interval_ms).
+# The keys are weak, an entry goes away together with its callback.
+_progress_trampolines: weakref.WeakKeyDictionary[Callable[[int, int], Any], dict[tuple[int, int], Any]] = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _wrap_progress(
+    callback: Callable[[int, int], Any],
+    min_bytes: int = PROGRESS_MIN_BYTES,
+    min_interval_ms: int = PROGRESS_MIN_INTERVAL_MS,
+) -> Any:
+    """
+    Returns the Progressfunc trampoline for callback. The trampoline is
+    created once per callback and reused by the following transfers as
+    long as the callback lives. Callbacks that are not hashable or can't
+    be weakly referenced get a new trampoline for every transfer.
+    """
+
+    try:
+        trampolines = _progress_trampolines.setdefault(callback, {})
+    except TypeError:
+        return _make_progress(lambda: callback, min_bytes, min_interval_ms)
+    key = (min_bytes, min_interval_ms)
+    progress = trampolines.get(key)
+    if progress is None:
+        # Only a weak reference, the trampoline must not keep its own cache key alive
+        progress = trampolines[key] = _make_progress(weakref.ref(callback), min_bytes, min_interval_ms)
+    return progress
+
+
+def _make_progress(
+    get_callback: Callable[[], Callable[[int, int], Any] | None], min_bytes: int, min_interval_ms: int
+) -> Any:
+    """
+    Returns a new Progressfunc trampoline for the callback returned by get_callback.
+    libmtp reports every USB chunk, the trampoline only calls the callback
+    when min_bytes were transferred or min_interval_ms passed since the
+    last call, and always for the end of the transfer. The throttle state
+    belongs to the transfer, see _transfer_progress().
+    """
+
+    min_interval = min_interval_ms / 1000
+
+    def progress(sent: int, total: int, data: int | None) -> int:
+        callback = get_callback()
+        if callback is None:
+            return 0
+        state = _progress_state.get(data) if data is not None else None
+        if state is not None:
+            now = time.monotonic()
+            if sent < total and sent - state[0] < min_bytes and now - state[1] < min_interval:
+                return 0
+            state[0] = sent
+            state[1] = now
+        return 1 if callback(sent, total) else 0
+
+    return Progressfunc(progress)
+
+
+@contextlib.contextmanager
+def _transfer_progress(
+    callback: Callable[[int, int], Any] | None, min_bytes: int, min_interval_ms: int
+) -> Iterator[tuple[Any, int | None]]:
+    """
+    Returns the Progressfunc and the data argument to pass to libmtp for one
+    transfer. The data argument is a token for the throttle state of this
+    transfer, the state is dropped when the transfer returns.
+    """
+
+    if callback is None:
+        yield _no_progress, None
+        return
+    token = next(_progress_tokens)
+    _progress_state[token] = [0, 0.0]
+    try:
+        yield _wrap_progress(callback, min_bytes, min_interval_ms), token
+    finally:
+        del _progress_state[token]
+
+
+def _stat_source(source: str | bytes) -> os.stat_result:
+    """
+    Returns the stat of a file that is to be sent to the device. One stat
+    call serves both the existence check and the size.
+    Raises IOError if the file does not exist or is no regular file.
+    """
+
+    try:
+        source_stat = os.stat(source)
+    except FileNotFoundError:
+        raise IOError(f"File {os.fsdecode(source)} not found")
+    if not stat.S_ISREG(source_stat.st_mode):
+        raise IOError(f"File {os.fsdecode(source)} not a regular file")
+    return source_stat
+
+
+def _prefetch_file(path: str | bytes) -> None:
+    """
+    Asks the kernel to read the file into the page cache in the background,
+    so libmtp finds it there when it reads the file later on.
+    Does nothing where posix_fadvise is not available.
+    """
+
+    if not hasattr(os, "posix_fadvise"):
+        return
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+# Guards the one time call of LIBMTP_Init
+_init_lock = threading.Lock()
+# Seconds a storage list read with LIBMTP_Get_Storage is reused
+_STORAGE_CACHE_TTL = 0.5
+# Number of track and playlist metadata entries kept by every MTP object
+_METADATA_CACHE_SIZE = 1024
+
 
 class MTP:
     """
@@ -432,7 +1176,7 @@ class MTP:
 
     libmtp_is_initialized: bool = False
 
-    def __init__(self, new_raw_device: ctypes._Pointer[LIBMTP_RawDevice] | str | None = None):
+    def __init__(self, new_raw_device: LIBMTP_RawDevice | str | None = None):
         """
         Initializes the MTP object
 
@@ -441,12 +1185,24 @@ class MTP:
         """
 
         self.mtp: ctypes.CDLL = _libmtp
-        if not self.libmtp_is_initialized:
-            self.mtp.LIBMTP_Init()
-            self.libmtp_is_initialized = True
+        # LIBMTP_Init must only run once per process, not once per instance
+        if not MTP.libmtp_is_initialized:
+            with _init_lock:
+                if not MTP.libmtp_is_initialized:
+                    _LIBMTP_Init()
+                    MTP.libmtp_is_initialized = True
         self.device: str | None = None
-        self._new_raw_device: ctypes._Pointer[LIBMTP_RawDevice] | str | None = new_raw_device
-        self.raw_devices: ctypes._Pointer[ctypes._Pointer[LIBMTP_RawDevice]]
+        self._new_raw_device: LIBMTP_RawDevice | str | None = new_raw_device
+        self.raw_devices: ctypes._Pointer[LIBMTP_RawDevice]
+        # Metadata buffer reused by every send_file_from_file call
+        self._send_meta: LIBMTP_File = LIBMTP_File()
+        # True once the storage list of the connected device was read
+        self._storage_refreshed: bool = False
+        # time.monotonic() of the last LIBMTP_Get_Storage call, None if the storage values are outdated
+        self._storage_cache_ts: float | None = None
+        # Metadata read from the device, cleared whenever the device content changes
+        self._track_metadata = functools.lru_cache(maxsize=_METADATA_CACHE_SIZE)(self._read_track_metadata)
+        self._playlist = functools.lru_cache(maxsize=_METADATA_CACHE_SIZE)(self._read_playlist)
 
     def debug_stack(self):
         """
@@ -458,10 +1214,10 @@ class MTP:
         """
 
         if __DEBUG__:
-            self.mtp.LIBMTP_Dump_Errorstack(self.device)
+            _LIBMTP_Dump_Errorstack(self.device)
             # self.mtp.LIBMTP_Clear_Errorstack()
 
-    def detect_devices(self) -> list[ctypes._Pointer[LIBMTP_RawDevice]]:
+    def detect_devices(self) -> list[LIBMTP_RawDevice]:
         """
         Detect if any MTP devices are connected
 
@@ -470,33 +1226,23 @@ class MTP:
 
         """
 
-        devlist: list[ctypes._Pointer[LIBMTP_RawDevice]] = []
-        device = LIBMTP_RawDevice()
-        self.raw_devices = ctypes.pointer(ctypes.pointer(device))
+        devlist: list[LIBMTP_RawDevice] = []
+        # NULL pointer, libmtp sets it to the array of found devices
+        self.raw_devices = ctypes.POINTER(LIBMTP_RawDevice)()
         numdevs = ctypes.c_int(0)
-        err = self.mtp.LIBMTP_Detect_Raw_Devices(ctypes.byref(self.raw_devices), ctypes.byref(numdevs))
-        if err == LIBMTP_Error_Number["NO_DEVICE_ATTACHED"]:
+        err = _LIBMTP_Detect_Raw_Devices(ctypes.byref(self.raw_devices), ctypes.byref(numdevs))
+        if err == LIBMTP_Error_Number.NO_DEVICE_ATTACHED:
             return devlist
-        elif err == LIBMTP_Error_Number["STORAGE_FULL"]:
-            # ignore this, we're just trying to detect here, not do anything else
-            pass
-        elif err == LIBMTP_Error_Number["CONNECTING"]:
-            raise AlreadyConnected("CONNECTING")
-        elif err == LIBMTP_Error_Number["GENERAL"]:
-            raise CommandFailed("GENERAL")
-        elif err == LIBMTP_Error_Number["PTP_LAYER"]:
-            raise CommandFailed("PTP_LAYER")
-        elif err == LIBMTP_Error_Number["USB_LAYER"]:
-            raise CommandFailed("USB_LAYER")
-        elif err == LIBMTP_Error_Number["MEMORY_ALLOCATION"]:
-            raise CommandFailed("MEMORY_ALLOCATION")
-        elif err == LIBMTP_Error_Number["CANCELLED"]:
-            raise CommandFailed("CANCELLED")
+        # STORAGE_FULL is ignored, we're just trying to detect here, not do anything else
+        action = _ERR_DISPATCH.get(err)
+        if action is not None:
+            exc, msg = action
+            raise exc(msg)
         if numdevs.value == 0:
             return devlist
-        for i in range(numdevs.value):
-            devlist.append(self.raw_devices[i])
-        return devlist
+        # libmtp returns one contiguous array of devices, view it as a whole instead of
+        # copying the entries one by one
+        return list((LIBMTP_RawDevice * numdevs.value).from_address(ctypes.addressof(self.raw_devices.contents)))
 
     def connect(self) -> None:
         """
@@ -513,7 +1259,7 @@ class MTP:
             raise ObjectNotFound
 
         # self.device = self.mtp.LIBMTP_Get_First_Device()
-        self.device = self.mtp.LIBMTP_Open_Raw_Device_Uncached(ctypes.byref(self._new_raw_device)) # pyright: ignore[reportArgumentType]
+        self.device = _LIBMTP_Open_Raw_Device_Uncached(ctypes.byref(self._new_raw_device)) # pyright: ignore[reportArgumentType]
 
         if not self.device:
             self.device = None
@@ -530,9 +1276,12 @@ class MTP:
         if self.device is None:
             raise NotConnected
 
-        self.mtp.LIBMTP_Release_Device(self.device)
+        _LIBMTP_Release_Device(self.device)
         del self.device
         self.device = None
+        self._storage_refreshed = False
+        self._storage_cache_ts = None
+        self._clear_metadata_cache()
 
     def get_devicename(self) -> str:
         """
@@ -546,7 +1295,7 @@ class MTP:
         if self.device is None:
             raise NotConnected
 
-        return self.mtp.LIBMTP_Get_Friendlyname(self.device).decode("UTF-8")
+        return _LIBMTP_Get_Friendlyname(self.device).decode("UTF-8")
 
     def get_modelname(self) -> str:
         """
@@ -560,7 +1309,7 @@ class MTP:
         if self.device is None:
             raise NotConnected
 
-        return self.mtp.LIBMTP_Get_Modelname(self.device).decode("UTF-8")
+        return _LIBMTP_Get_Modelname(self.device).decode("UTF-8")
 
     def create_folder(self, name: str, parent: int = 0, storage: int = 0) -> int:
         """
@@ -581,7 +1330,8 @@ class MTP:
         if self.device is None:
             raise NotConnected
 
-        ret: int = int(self.mtp.LIBMTP_Create_Folder(self.device, name.encode("UTF-8"), parent, storage))
+        ret: int = int(_LIBMTP_Create_Folder(self.device, name.encode("UTF-8"), parent, storage))
+        self._storage_cache_ts = None
 
         if ret == 0:
             self.debug_stack()
@@ -589,7 +1339,16 @@ class MTP:
 
         return ret
 
-    def send_file_from_file(self, source: str, target: str, storage_id: int, parent_id: int) -> int:
+    def send_file_from_file(
+        self,
+        source: str | bytes,
+        target: str | bytes,
+        storage_id: int,
+        parent_id: int,
+        callback: Callable[[int, int], Any] | None = None,
+        min_bytes: int = PROGRESS_MIN_BYTES,
+        min_interval_ms: int = PROGRESS_MIN_INTERVAL_MS,
+    ) -> int:
         """
         Sends a file from the filesystem to the connected device
         and stores it at the target filename inside the parent.
@@ -597,14 +1356,25 @@ class MTP:
         This will attempt to "guess" the filetype with
         find_filetype()
 
-        @type source: str
+        @type source: str or bytes
         @param source: The path on the filesystem where the file resides
-        @type target: str
-        @param target: The target filename on the device
+        @type target: str or bytes
+        @param target: The target filename on the device, bytes must be UTF-8 encoded
         @type storage_id: int
         @param storage_id: The id of the storage to store the file on
         @type parent_id: int
         @param parent_id: The id of folder to store the file in
+        @type callback: function or None
+        @param callback: The function provided to libmtp to
+         receive callbacks from ptp. Callback must take two
+         arguments, sent and total (in bytes). If it returns
+         a true value the transfer is cancelled.
+        @type min_bytes: int
+        @param min_bytes: The callback is called after at least
+         this many bytes, 0 calls it for every chunk
+        @type min_interval_ms: int
+        @param min_interval_ms: The callback is also called when
+         this many milliseconds passed since its last call
         @rtype: int
         @return: The object ID of the new file
         """
@@ -612,53 +1382,343 @@ class MTP:
         if self.device is None:
             raise NotConnected
 
-        if os.path.isfile(source) == False:
-            raise IOError(f"File {source} not found")
+        return self._send_file(source, target, storage_id, parent_id, callback, min_bytes, min_interval_ms)
+
+    def send_files_from_files(
+        self,
+        items: list[tuple[str | bytes, str | bytes, int, int]],
+        callback: Callable[[int, int], Any] | None = None,
+        min_bytes: int = PROGRESS_MIN_BYTES,
+        min_interval_ms: int = PROGRESS_MIN_INTERVAL_MS,
+    ) -> list[int]:
+        """
+        Sends several files from the filesystem to the connected device.
+        The connection is checked once for the whole batch and all sources
+        are checked before the first file is sent. The transfer stops with
+        the first file that fails, the exception raised then has the object
+        IDs of the files already sent in its attribute sent_ids. While one
+        file is sent the next one is already read from disk.
+
+        @type items: list
+        @param items: One tuple (source, target, storage_id, parent_id) per file,
+         with the same meaning as the parameters of send_file_from_file()
+        @type callback: function or None
+        @param callback: Called with the progress of every single file,
+         see send_file_from_file()
+        @type min_bytes: int
+        @param min_bytes: See send_file_from_file()
+        @type min_interval_ms: int
+        @param min_interval_ms: See send_file_from_file()
+        @rtype: list
+        @return: The object IDs of the new files, in the order of items
+        """
+
+        if self.device is None:
+            raise NotConnected
+
+        # A missing source must not be found after the files before it were sent
+        source_stats = [_stat_source(os.fsencode(item[0])) for item in items]
+
+        send_file = self._send_file
+        ret: list[int] = []
+        last = len(items) - 1
+        try:
+            for i, (source, target, storage_id, parent_id) in enumerate(items):
+                # Let the kernel read the next file while this one is transferred over USB
+                if i < last:
+                    _prefetch_file(items[i + 1][0])
+                ret.append(
+                    send_file(
+                        source, target, storage_id, parent_id, callback, min_bytes, min_interval_ms, source_stats[i]
+                    )
+                )
+        except Exception as err:
+            err.sent_ids = ret  # pyright: ignore[reportAttributeAccessIssue]
+            raise
+        return ret
+
+    def _send_file(
+        self,
+        source: str | bytes,
+        target: str | bytes,
+        storage_id: int,
+        parent_id: int,
+        callback: Callable[[int, int], Any] | None,
+        min_bytes: int,
+        min_interval_ms: int,
+        source_stat: os.stat_result | None = None,
+    ) -> int:
+        """
+        Sends one file to the connected device, see send_file_from_file().
+        source_stat is the result of _stat_source() if the caller has it already.
+        The caller must have checked that a device is connected.
+        """
+
+        # Already encoded paths are passed through unchanged
+        source_b = os.fsencode(source)
+        target_b = target if isinstance(target, bytes) else target.encode("UTF-8")
 
-        metadata = LIBMTP_File(
-            filename=target.encode("UTF-8"),
-            filetype=self.find_filetype(source),
-            filesize=os.stat(source).st_size,
-            storage_id=storage_id,
-            parent_id=parent_id,
+        if source_stat is None:
+            source_stat = _stat_source(source_b)
+
+        metadata = self._fill_send_meta(
+            target_b, self.find_filetype(os.fsdecode(source)), source_stat.st_size, storage_id, parent_id
         )
 
-        ret = int(
-            self.mtp.LIBMTP_Send_File_From_File(
-                self.device, source.encode("UTF-8"), ctypes.pointer(metadata), None, None
+        with _transfer_progress(callback, min_bytes, min_interval_ms) as (progress, token):
+            ret = int(
+                _LIBMTP_Send_File_From_File(
+                    self.device, source_b, ctypes.byref(metadata), progress, token
+                )
             )
+        self._storage_cache_ts = None
+
+        if ret != 0:
+            self.debug_stack()
+            raise CommandFailed
+
+        return metadata.item_id
+
+    def send_file_from_buffer(
+        self,
+        data: Buffer,
+        target: str | bytes,
+        storage_id: int,
+        parent_id: int,
+        callback: Callable[[int, int], Any] | None = None,
+        min_bytes: int = PROGRESS_MIN_BYTES,
+        min_interval_ms: int = PROGRESS_MIN_INTERVAL_MS,
+    ) -> int:
+        """
+        Sends data that is already in memory to the connected device and
+        stores it at the target filename inside the parent. libmtp copies
+        the data straight out of the buffer, no temporary file is needed.
+
+        This will attempt to "guess" the filetype with
+        find_filetype() from the target filename
+
+        @type data: bytes, bytearray, memoryview, mmap or another C-contiguous buffer
+        @param data: The content of the new file
+        @type target: str or bytes
+        @param target: The target filename on the device, bytes must be UTF-8 encoded
+        @type storage_id: int
+        @param storage_id: The id of the storage to store the file on
+        @type parent_id: int
+        @param parent_id: The id of folder to store the file in
+        @type callback: function or None
+        @param callback: The function provided to libmtp to
+         receive callbacks from ptp. Callback must take two
+         arguments, sent and total (in bytes). If it returns
+         a true value the transfer is cancelled.
+        @type min_bytes: int
+        @param min_bytes: The callback is called after at least
+         this many bytes, 0 calls it for every chunk
+        @type min_interval_ms: int
+        @param min_interval_ms: The callback is also called when
+         this many milliseconds passed since its last call
+        @rtype: int
+        @return: The object ID of the new file
+        """
+
+        if self.device is None:
+            raise NotConnected
+
+        target_b = target if isinstance(target, bytes) else target.encode("UTF-8")
+        # Keeps the buffer exported (and so unchanged) until the transfer is finished
+        view = memoryview(data).cast("B")
+        size = view.nbytes
+        base = None
+        if isinstance(data, bytes):
+            base = ctypes.cast(ctypes.c_char_p(data), ctypes.c_void_p).value or 0
+        elif not view.readonly:
+            base = ctypes.addressof((ctypes.c_char * size).from_buffer(view))
+        offset = 0
+
+        def get_data(_params: Any, _priv: Any, wantlen: int, out: int, gotlen: Any) -> int:
+            nonlocal offset
+            length = min(wantlen, size - offset)
+            if base is None:
+                # ctypes has no address for a read-only buffer, copy the chunk
+                ctypes.memmove(out, view[offset : offset + length].tobytes(), length)
+            else:
+                ctypes.memmove(out, base + offset, length)
+            offset += length
+            gotlen[0] = length
+            return LIBMTP_HANDLER_RETURN_OK
+
+        metadata = self._fill_send_meta(
+            target_b, self.find_filetype(os.fsdecode(target_b)), size, storage_id, parent_id
         )
 
+        with _transfer_progress(callback, min_bytes, min_interval_ms) as (progress, token):
+            ret = int(
+                _LIBMTP_Send_File_From_Handler(
+                    self.device, MTPDataGetFunc(get_data), None, ctypes.byref(metadata), progress, token
+                )
+            )
+        self._storage_cache_ts = None
+
         if ret != 0:
             self.debug_stack()
             raise CommandFailed
 
         return metadata.item_id
 
-    def get_file_to_file(self, file_id: int, target: str) -> None:
+    def _fill_send_meta(
+        self, target: bytes, filetype: int, filesize: int, storage_id: int, parent_id: int
+    ) -> LIBMTP_File:
+        """
+        Fills the reused metadata buffer for the next upload and returns it.
+        """
+
+        metadata = self._send_meta
+        metadata.item_id = 0
+        metadata.filename = target
+        metadata.filetype = filetype
+        metadata.filesize = filesize
+        metadata.storage_id = storage_id
+        metadata.parent_id = parent_id
+        metadata.next = None
+        return metadata
+
+    def get_file_to_file(
+        self,
+        file_id: int,
+        target: str | bytes,
+        callback: Callable[[int, int], Any] | None = None,
+        min_bytes: int = PROGRESS_MIN_BYTES,
+        min_interval_ms: int = PROGRESS_MIN_INTERVAL_MS,
+    ) -> None:
         """
         Downloads the file from the connected device and stores it at the
         target location
 
         @type file_id: int
         @param file_id: The unique numeric file id
-        @type target: str
+        @type target: str or bytes
         @param target: The location to place the file
         @type callback: function or None
         @param callback: The function provided to libmtp to
          receive callbacks from ptp. Callback must take two
-         arguments, total and sent (in bytes)
+         arguments, sent and total (in bytes). If it returns
+         a true value the transfer is cancelled.
+        @type min_bytes: int
+        @param min_bytes: The callback is called after at least
+         this many bytes, 0 calls it for every chunk
+        @type min_interval_ms: int
+        @param min_interval_ms: The callback is also called when
+         this many milliseconds passed since its last call
+        """
+
+        if self.device is None:
+            raise NotConnected
+
+        with _transfer_progress(callback, min_bytes, min_interval_ms) as (progress, token):
+            ret = int(_LIBMTP_Get_File_To_File(self.device, file_id, os.fsencode(target), progress, token))
+
+        if ret != 0:
+            self.debug_stack()
+            raise CommandFailed
+
+    def get_track_to_file(
+        self,
+        track_id: int,
+        target: str | bytes,
+        callback: Callable[[int, int], Any] | None = None,
+        min_bytes: int = PROGRESS_MIN_BYTES,
+        min_interval_ms: int = PROGRESS_MIN_INTERVAL_MS,
+    ) -> None:
+        """
+        Downloads the track from the connected device and stores it at
+        the target location
+
+        Like all libmtp calls the transfer runs without holding the GIL,
+        other Python threads keep running while it blocks. The callback
+        takes the GIL only while it is called.
+
+        @type track_id: int
+        @param track_id: The unique numeric track id
+        @type target: str or bytes
+        @param target: The location to place the track
+        @type callback: function or None
+        @param callback: The function provided to libmtp to
+         receive callbacks from ptp. Callback must take two
+         arguments, sent and total (in bytes)
+        @type min_bytes: int
+        @param min_bytes: See get_file_to_file()
+        @type min_interval_ms: int
+        @param min_interval_ms: See get_file_to_file()
+        """
+
+        if self.device is None:
+            raise NotConnected
+
+        with _transfer_progress(callback, min_bytes, min_interval_ms) as (progress, token):
+            ret = int(_LIBMTP_Get_Track_To_File(self.device, track_id, os.fsencode(target), progress, token))
+
+        if ret != 0:
+            self.debug_stack()
+            raise CommandFailed
+
+    def send_track_from_file(
+        self,
+        source: str | bytes,
+        target: str | bytes,
+        metadata: LIBMTP_Track,
+        callback: Callable[[int, int], Any] | None = None,
+        min_bytes: int = PROGRESS_MIN_BYTES,
+        min_interval_ms: int = PROGRESS_MIN_INTERVAL_MS,
+    ) -> int:
+        """
+        Sends a track from the filesystem to the connected
+        device
+
+        @type source: str or bytes
+        @param source: The path where the track resides
+        @type target: str or bytes
+        @param target: The target filename on the device, bytes must be UTF-8 encoded
+        @type metadata: LIBMTP_Track
+        @param metadata: The track metadata
+        @type callback: function or None
+        @param callback: The function provided to libmtp to
+         receive callbacks from ptp. Callback function must
+         take two arguments, sent and total (in bytes)
+        @type min_bytes: int
+        @param min_bytes: See send_file_from_file()
+        @type min_interval_ms: int
+        @param min_interval_ms: See send_file_from_file()
+        @rtype: int
+        @return: The object ID of the new track
         """
 
         if self.device is None:
             raise NotConnected
 
-        ret = int(self.mtp.LIBMTP_Get_File_To_File(self.device, file_id, target.encode("UTF-8"), None, None))
+        # Already encoded paths are passed through unchanged
+        source_b = os.fsencode(source)
+        target_b = target if isinstance(target, bytes) else target.encode("UTF-8")
+
+        source_stat = _stat_source(source_b)
+
+        metadata.filename = target_b
+        metadata.filetype = self.find_filetype(os.fsdecode(source))
+        metadata.filesize = source_stat.st_size
+
+        with _transfer_progress(callback, min_bytes, min_interval_ms) as (progress, token):
+            ret = int(
+                _LIBMTP_Send_Track_From_File(
+                    self.device, source_b, ctypes.byref(metadata), progress, token
+                )
+            )
+        self._storage_cache_ts = None
+        self._clear_metadata_cache()
 
         if ret != 0:
             self.debug_stack()
             raise CommandFailed
 
+        return metadata.item_id
+
     def delete_object(self, object_id: int) -> None:
         """
         Deletes the object off the connected device.
@@ -670,7 +1730,9 @@ class MTP:
         if self.device is None:
             raise NotConnected
 
-        ret: int = int(self.mtp.LIBMTP_Delete_Object(self.device, object_id))
+        ret: int = int(_LIBMTP_Delete_Object(self.device, object_id))
+        self._storage_cache_ts = None
+        self._clear_metadata_cache()
 
         if ret != 0:
             self.debug_stack()
@@ -687,25 +1749,80 @@ class MTP:
         if self.device is None:
             raise NotConnected
 
-        return str(self.mtp.LIBMTP_Get_Serialnumber(self.device).decode("UTF-8"))
+        return str(_LIBMTP_Get_Serialnumber(self.device).decode("UTF-8"))
 
-    def get_files_and_folder(self, storage_id: int, parent_id: int) -> list[LIBMTP_File]:
+    def get_files_and_folder(self, storage_id: int, parent_id: int) -> FileListing:
         """
         This function retrieves the contents of a certain folder with id parent on a certain storage on a certain
         device. The result contains both files and folders. The device used with this operations must have been
         opened with LIBMTP_Open_Raw_Device_Uncached() or it will fail.
+
+        The linked list returned by libmtp is walked once, its values are copied into
+        a FileListing and every node is freed right after it has been copied.
+
+        This is the way to read the metadata of many objects: the whole folder costs
+        one request to the device, while get_file_metadata() costs one per object.
+
+        @rtype: FileListing
+        @return: The files and folders found in the folder
         """
-        ret: list[LIBMTP_File] = []
         if self.device is None:
             raise NotConnected
-        files = self.mtp.LIBMTP_Get_Files_And_Folders(self.device, storage_id, parent_id)
-        next = files
-        while next:
-            ret.append(next.contents)
-            if next.contents.next is None:
-                break
-            next = next.contents.next
-        return ret
+        listing = FileListing()
+        _copy_file_list(_LIBMTP_Get_Files_And_Folders(self.device, storage_id, parent_id), listing)
+        return listing
+
+    def get_file_metadata(self, file_id: int) -> FileListing:
+        """
+        Returns the file metadata from the connected device
+
+        As per the libmtp documentation, calling this function
+        repeatly is not recommended, as it is slow and creates
+        a large amount of USB traffic. To read the metadata of
+        the entries of a folder use get_files_and_folder().
+
+        @type file_id: int
+        @param file_id: The unique numeric file id
+        @rtype: FileListing
+        @return: A FileListing with the file as its only entry
+        """
+
+        if self.device is None:
+            raise NotConnected
+
+        listing = FileListing()
+        _copy_file_list(_LIBMTP_Get_Filemetadata(self.device, file_id), listing)
+        if not listing:
+            raise ObjectNotFound
+
+        return listing
+
+    def get_files_and_folder_recursive(self, storage_id: int, parent_id: int) -> FileListing:
+        """
+        Like get_files_and_folder() but also retrieves the contents of all subfolders.
+        The folders are read breadth first and all entries are collected in one
+        FileListing, the tree can be rebuilt with the parent_id column.
+
+        @type storage_id: int
+        @param storage_id: The id of the storage to read
+        @type parent_id: int
+        @param parent_id: The id of the folder to start with or
+                          LIBMTP_FILES_AND_FOLDERS_ROOT for the whole storage
+        @rtype: FileListing
+        @return: The files and folders found below the folder
+        """
+        if self.device is None:
+            raise NotConnected
+        listing = FileListing()
+        folder_type = LIBMTP_Filetype.FOLDER
+        pending: collections.deque[int] = collections.deque([parent_id])
+        while pending:
+            start = len(listing)
+            _copy_file_list(_LIBMTP_Get_Files_And_Folders(self.device, storage_id, pending.popleft()), listing)
+            pending.extend(
+                listing.item_id[i] for i in range(start, len(listing)) if listing.filetype[i] == folder_type
+            )
+        return listing
 
     def get_storage(self) -> list[tuple[str, int]]:
         """
@@ -714,37 +1831,310 @@ class MTP:
         storage information in your application you should call this function, then dereference the device struct
         (device->storage) to get out information on the storage.
 
-        You need to call this everytime you want to update the device->storage list, for example anytime you need
-        to check available storage somewhere.
+        The storages of a device don't change while it is connected, so the list is only read
+        once per connection. Call refresh_storage() first if a storage (e.g. a SD card) was
+        added or removed since then.
 
                 @rtype: list
                 @return: Returns a list with the storage names and the id
         """
 
+        storages = _walk_linked_list(self._get_storage(None), ("StorageDescription", "id"))
+        return [(description.decode("UTF-8"), storage_id) for description, storage_id in storages]
+
+    def refresh_storage(self) -> None:
+        """
+        Reads the storage list of the device again, e.g. to get the
+        free space right after a large write.
+
+        @rtype: None
+        @return: None
+        """
+
         if self.device is None:
             raise NotConnected
-        err = self.mtp.LIBMTP_Get_Storage(self.device, 0)
+        err = _LIBMTP_Get_Storage(self.device, 0)
         if err == -1:
-            self.mtp.LIBMTP_Dump_Errorstack(self.device)
-            self.mtp.LIBMTP_Clear_Errorstack(self.device)
+            _LIBMTP_Dump_Errorstack(self.device)
+            _LIBMTP_Clear_Errorstack(self.device)
             raise CommandFailed
-        ret: list[tuple[str, int]] = []
-        next: Any = self.device.contents.storage    # pyright: ignore[reportAttributeAccessIssue]
-
-        while next:
-            ret.append(
-                (
-                    next.contents.StorageDescription.decode("UTF-8"),
-                    next.contents.id,
-                )
-            )
-            if next.contents.next is None:
-                break
-            next = next.contents.next
+        self._storage_refreshed = True
+        self._storage_cache_ts = time.monotonic()
+
+    def _get_storage(self, max_age: float | None = _STORAGE_CACHE_TTL) -> ctypes._Pointer[LIBMTP_DeviceStorage]:
+        """
+        Returns the storage list of the device. LIBMTP_Get_Storage is only
+        called when the list was not read yet in this connection or, for
+        the values, when the last call is older than max_age seconds or the
+        device content was changed since then. Consecutive queries share
+        one USB transaction.
+
+        @type max_age: float or None
+        @param max_age: Seconds the storage values may be old,
+         None if only the storage ids and names are needed
+        @rtype: pointer to LIBMTP_DeviceStorage
+        @return: The head of the device's storage list
+        """
+
+        if self.device is None:
+            raise NotConnected
+        if not self._storage_refreshed or (
+            max_age is not None
+            and (self._storage_cache_ts is None or time.monotonic() - self._storage_cache_ts >= max_age)
+        ):
+            self.refresh_storage()
+        return self.device.contents.storage  # pyright: ignore[reportAttributeAccessIssue]
+
+    def get_freespace(self) -> int:
+        """
+        Returns the amount of free space on the primary storage
+        of the connected device
+
+        @rtype: int
+        @return: The amount of free storage in bytes
+        """
+
+        return self._get_storage().contents.FreeSpaceInBytes
+
+    def get_totalspace(self) -> int:
+        """
+        Returns the total space on the primary storage
+        of the connected device
+
+        @rtype: int
+        @return: The amount of total storage in bytes
+        """
+
+        return self._get_storage().contents.MaxCapacity
+
+    def get_usedspace(self) -> int:
+        """
+        Returns the amount of used space on the primary storage
+        of the connected device
+
+        @rtype: int
+        @return: The amount of used storage in bytes
+        """
+
+        storage = self._get_storage().contents
+        return storage.MaxCapacity - storage.FreeSpaceInBytes
+
+    def get_usedspace_percent(self) -> float:
+        """
+        Returns the amount of used space on the primary storage
+        as a percentage
+
+        @rtype: float
+        @return: The percentage of used storage
+        """
+
+        storage = self._get_storage().contents
+        usedspace = storage.MaxCapacity - storage.FreeSpaceInBytes
+        return (float(usedspace) / float(storage.MaxCapacity)) * 100
+
+    def get_folder_list(self) -> Folders:
+        """
+        Returns the folders on the device.
+
+        The folder tree is walked once and only the values
+        are kept, no ctypes structure is handed out. Use
+        Folders.by_id to find the entry of a folder ID.
+
+        @rtype: Folders
+        @return: The folders on the device
+        """
+
+        if self.device is None:
+            raise NotConnected
+
+        head = _LIBMTP_Get_Folder_List(self.device)
+        try:
+            return _folders_from_rows(_walk_folder_tree(head, _FOLDER_FIELDS))
+        finally:
+            if head:
+                _LIBMTP_destroy_folder_t(head)
+
+    def get_parent_folders(self) -> Folders:
+        """
+        Returns only the parent folders.
+
+        @rtype: Folders
+        @return: Returns the parent folders
+        """
+
+        if self.device is None:
+            raise NotConnected
+
+        # The top level folders are the root folder and its siblings
+        head = _LIBMTP_Get_Folder_List(self.device)
+        try:
+            return _folders_from_rows(_walk_linked_list(head, _FOLDER_FIELDS, link="sibling"))
+        finally:
+            if head:
+                _LIBMTP_destroy_folder_t(head)
+
+    def get_playlists(self) -> list[LIBMTP_Playlist]:
+        """
+        Returns a list filled with L{LIBMTP_Playlist} objects
+        from the connected device.
+
+        The playlists are copies that own their name and tracks,
+        the playlists of libmtp are freed. If only the names and
+        sizes of the playlists are needed use get_playlists_summary().
+
+        @rtype: list
+        @return: List filled with LIBMTP_Playlist objects
+        """
 
+        if self.device is None:
+            raise NotConnected
+
+        return _walk_linked_list(_LIBMTP_Get_Playlist_List(self.device), _copy_playlist, _LIBMTP_destroy_playlist_t)
+
+    def get_playlists_summary(self) -> list[tuple[int, str, int]]:
+        """
+        Returns the id, name and number of tracks of every playlist
+        on the connected device. The playlist list is walked once and
+        freed right away.
+
+        @rtype: list
+        @return: List of tuples (playlist_id, name, no_tracks)
+        """
+
+        if self.device is None:
+            raise NotConnected
+
+        rows = _walk_linked_list(
+            _LIBMTP_Get_Playlist_List(self.device), ("playlist_id", "name", "no_tracks"), _LIBMTP_destroy_playlist_t
+        )
+        return [(playlist_id, name.decode("UTF-8"), no_tracks) for playlist_id, name, no_tracks in rows]
+
+    def get_track_metadata(self, track_id: int) -> dict[str, Any]:
+        """
+        Returns the track metadata
+
+        As per the libmtp documentation, calling this function repeatly is not
+        recommended, as it is slow and creates a large amount of USB traffic.
+        The metadata is therefore cached until the device content changes.
+
+        @type track_id: int
+        @param track_id: The unique numeric track id
+        @rtype: dict
+        @return: The track metadata, the keys are the field names of L{LIBMTP_Track}
+        """
+
+        if self.device is None:
+            raise NotConnected
+
+        return dict(self._track_metadata(track_id))
+
+    def _read_track_metadata(self, track_id: int) -> dict[str, Any]:
+        """
+        Reads the track metadata from the device, see get_track_metadata().
+        """
+
+        track = _LIBMTP_Get_Trackmetadata(self.device, track_id)
+        if not track:
+            raise ObjectNotFound
+        try:
+            return _struct_to_dict(track.contents, _TRACK_FIELDS)
+        finally:
+            _LIBMTP_destroy_track_t(track)
+
+    def get_playlist(self, playlist_id: int) -> dict[str, Any]:
+        """
+        Returns the playlist with the requested playlist_id
+        from the connected device. The playlist is cached until
+        the device content changes.
+
+        @type playlist_id: int
+        @param playlist_id: The unique playlist identifier
+        @rtype: dict
+        @return: The playlist_id, parent_id, storage_id, name
+         and the list of tracks of the playlist
+        """
+
+        if self.device is None:
+            raise NotConnected
+
+        ret = dict(self._playlist(playlist_id))
+        ret["tracks"] = list(ret["tracks"])
         return ret
 
-    def find_filetype(self, filename: str) -> ctypes.c_int:
+    def _read_playlist(self, playlist_id: int) -> dict[str, Any]:
+        """
+        Reads the playlist from the device, see get_playlist().
+        """
+
+        playlist = _LIBMTP_Get_Playlist(self.device, playlist_id)
+        if not playlist:
+            raise ObjectNotFound
+        try:
+            ret = _struct_to_dict(playlist.contents, _PLAYLIST_FIELDS)
+            ret["tracks"] = tuple(playlist.contents)
+        finally:
+            _LIBMTP_destroy_playlist_t(playlist)
+        return ret
+
+    def create_new_playlist(self, metadata: LIBMTP_Playlist) -> int:
+        """
+        Creates a new playlist based on the metadata object
+        passed.
+
+        @type metadata: LIBMTP_Playlist
+        @param metadata: A LIBMTP_Playlist object describing
+         the playlist
+        @rtype: int
+        @return: The object ID of the new playlist
+        """
+
+        if self.device is None:
+            raise NotConnected
+
+        ret = int(_LIBMTP_Create_New_Playlist(self.device, ctypes.byref(metadata)))
+        self._storage_cache_ts = None
+        self._clear_metadata_cache()
+
+        if ret != 0:
+            self.debug_stack()
+            raise CommandFailed
+
+        return metadata.playlist_id
+
+    def update_playlist(self, metadata: LIBMTP_Playlist) -> None:
+        """
+        Updates a playlist based on the supplied metadata.
+
+        When updating the tracks field in a playlist, this
+        function will replace the playlist's tracks with
+        the tracks supplied in the metadata object. This
+        means that the previous tracks in the playlist
+        will be overwritten.
+
+        @type metadata: LIBMTP_Playlist
+        @param metadata: A LIBMTP_Playlist object describing
+         the updates to the playlist.
+        """
+
+        if self.device is None:
+            raise NotConnected
+
+        ret = int(_LIBMTP_Update_Playlist(self.device, ctypes.byref(metadata)))
+        self._clear_metadata_cache()
+
+        if ret != 0:
+            self.debug_stack()
+            raise CommandFailed
+
+    def _clear_metadata_cache(self) -> None:
+        """
+        Forgets the cached track and playlist metadata.
+        """
+
+        self._track_metadata.cache_clear()
+        self._playlist.cache_clear()
+
+    def find_filetype(self, filename: str) -> int:
         """
         Attempts to guess the filetype off the filename. Kind of
         inaccurate and should be trusted with a grain of salt. It
@@ -756,72 +2146,8 @@ class MTP:
         @return: The integer of the Filetype
         """
 
-        fileext = filename.lower().split(".")[-1]
-
-        if fileext == "wav" or fileext == "wave":
-            return LIBMTP_Filetype["WAV"]
-        elif fileext == "mp3":
-            return LIBMTP_Filetype["MP3"]
-        elif fileext == "wma":
-            return LIBMTP_Filetype["WMA"]
-        elif fileext == "ogg":
-            return LIBMTP_Filetype["OGG"]
-        elif fileext == "mp4":
-            return LIBMTP_Filetype["MP4"]
-        elif fileext == "wmv":
-            return LIBMTP_Filetype["WMV"]
-        elif fileext == "avi":
-            return LIBMTP_Filetype["AVI"]
-        elif fileext == "mpeg" or fileext == "mpg":
-            return LIBMTP_Filetype["MPEG"]
-        elif fileext == "asf":
-            return LIBMTP_Filetype["ASF"]
-        elif fileext == "qt" or fileext == "mov":
-            return LIBMTP_Filetype["QT"]
-        elif fileext == "jpeg" or fileext == "jpg":
-            return LIBMTP_Filetype["JPEG"]
-        elif fileext == "jfif":
-            return LIBMTP_Filetype["JFIF"]
-        elif fileext == "tif" or fileext == "tiff":
-            return LIBMTP_Filetype["TIFF"]
-        elif fileext == "bmp":
-            return LIBMTP_Filetype["BMP"]
-        elif fileext == "gif":
-            return LIBMTP_Filetype["GIF"]
-        elif fileext == "pic" or fileext == "pict":
-            return LIBMTP_Filetype["PICT"]
-        elif fileext == "png":
-            return LIBMTP_Filetype["PNG"]
-        elif fileext == "wmf":
-            return LIBMTP_Filetype["WINDOWSIMAGEFORMAT"]
-        elif fileext == "ics":
-            return LIBMTP_Filetype["VCALENDAR2"]
-        elif fileext == "exe" or fileext == "com" or fileext == "bat" or fileext == "dll" or fileext == "sys":
-            return LIBMTP_Filetype["WINEXEC"]
-        elif fileext == "aac":
-            return LIBMTP_Filetype["AAC"]
-        elif fileext == "mp2":
-            return LIBMTP_Filetype["MP2"]
-        elif fileext == "flac":
-            return LIBMTP_Filetype["FLAC"]
-        elif fileext == "m4a":
-            return LIBMTP_Filetype["M4A"]
-        elif fileext == "doc":
-            return LIBMTP_Filetype["DOC"]
-        elif fileext == "xml":
-            return LIBMTP_Filetype["XML"]
-        elif fileext == "xls":
-            return LIBMTP_Filetype["XLS"]
-        elif fileext == "ppt":
-            return LIBMTP_Filetype["PPT"]
-        elif fileext == "mht":
-            return LIBMTP_Filetype["MHT"]
-        elif fileext == "jp2":
-            return LIBMTP_Filetype["JP2"]
-        elif fileext == "jpx":
-            return LIBMTP_Filetype["JPX"]
-        else:
-            return LIBMTP_Filetype["UNKNOWN"]
+        fileext = filename.rsplit(".", 1)[-1].lower()
+        return _EXT_TO_FILETYPE.get(fileext, _UNKNOWN_FILETYPE)
 
     # def get_manufacturer(self):
     #     """
@@ -940,30 +2266,6 @@ class MTP:
 
     #     return self.mtp.LIBMTP_Get_Filetype_Description(filetype)
 
-    # def get_file_metadata(self, file_id):
-    #     """
-    #     Returns the file metadata from the connected device
-
-    #     As per the libmtp documentation, calling this function
-    #     repeatly is not recommended, as it is slow and creates
-    #     a large amount of USB traffic.
-
-    #     @type file_id: int
-    #     @param file_id: The unique numeric file id
-    #     @rtype: LIBMTP_File
-    #     @return: The file metadata
-    #     """
-
-    #     if self.device is None:
-    #         raise NotConnected
-
-    #     ret = self.mtp.LIBMTP_Get_Filemetadata(self.device, file_id)
-
-    #     if not hasattr(ret, "contents"):
-    #         raise ObjectNotFound
-
-    #     return ret.contents
-
     # def get_tracklisting(self, callback=None):
     #     """
     #     Returns tracks from the connected device
@@ -994,340 +2296,6 @@ class MTP:
 
     #     return ret
 
-    # def get_track_metadata(self, track_id):
-    #     """
-    #     Returns the track metadata
-
-    #     As per the libmtp documentation, calling this function repeatly is not
-    #     recommended, as it is slow and creates a large amount of USB traffic.
-
-    #     @type track_id: int
-    #     @param track_id: The unique numeric track id
-    #     @rtype: L{LIBMTP_Track}
-    #     @return: The track metadata
-    #     """
-
-    #     if self.device is None:
-    #         raise NotConnected
-
-    #     ret = self.mtp.LIBMTP_Get_Trackmetadata(self.device, track_id)
-
-    #     if not hasattr(ret, "contents"):
-    #         raise ObjectNotFound
-
-    #     return ret.contents
-
-    # def get_track_to_file(self, track_id, target, callback=None):
-    #     """
-    #     Downloads the track from the connected device and stores it at
-    #     the target location
-
-    #     @type track_id: int
-    #     @param track_id: The unique numeric track id
-    #     @type target: str
-    #     @param target: The location to place the track
-    #     @type callback: function or None
-    #     @param callback: The function provided to libmtp to
-    #      receive callbacks from ptp. Callback must take two
-    #      arguments, total and sent (in bytes)
-    #     """
-
-    #     if self.device is None:
-    #         raise NotConnected
-
-    #     if callback != None:
-    #         callback = Progressfunc(callback)
-
-    #     ret = self.mtp.LIBMTP_Get_Track_To_File(self.device, track_id, target, callback, None)
-
-    #     if ret != 0:
-    #         self.debug_stack()
-    #         raise CommandFailed
-
-    # def send_track_from_file(self, source, target, metadata, callback=None):
-    #     """
-    #     Sends a track from the filesystem to the connected
-    #     device
-
-    #     @type source: str
-    #     @param source: The path where the track resides
-    #     @type target: str
-    #     @param target: The target filename on the device
-    #     @type metadata: LIBMTP_Track
-    #     @param metadata: The track metadata
-    #     @type callback: function or None
-    #     @param callback: The function provided to libmtp to
-    #      receive callbacks from ptp. Callback function must
-    #      take two arguments, sent and total (in bytes)
-    #     @rtype: int
-    #     @return: The object ID of the new track
-    #     """
-
-    #     if self.device is None:
-    #         raise NotConnected
-
-    #     if os.path.exists(source) is None:
-    #         raise IOError
-
-    #     if callback:
-    #         callback = Progressfunc(callback)
-
-    #     metadata.filename = target
-    #     metadata.filetype = self.find_filetype(source)
-    #     metadata.filesize = os.stat(source).st_size
-
-    #     ret = self.mtp.LIBMTP_Send_Track_From_File(
-    #         self.device, source, ctypes.pointer(metadata), callback, None
-    #     )
-
-    #     if ret != 0:
-    #         self.debug_stack()
-    #         raise CommandFailed
-
-    #     return metadata.item_id 
-
-    # def get_freespace(self):
-    #     """
-    #     Returns the amount of free space on the connected device
-    #     @rtype: long
-    #     @return: The amount of free storage in bytes
-    #     """
-
-    #     if self.device is None:
-    #         raise NotConnected
-
-    #     self.mtp.LIBMTP_Get_Storage(self.device, 0)
-    #     return self.device.contents.storage.contents.FreeSpaceInBytes
-
-    # def get_totalspace(self):
-    #     """
-    #     Returns the total space on the connected device
-    #     @rtype: long
-    #     @return: The amount of total storage in bytes
-    #     """
-
-    #     if self.device is None:
-    #         raise NotConnected
-
-    #     self.mtp.LIBMTP_Get_Storage(self.device, 0)
-    #     return self.device.contents.storage.contents.MaxCapacity
-
-    # def get_usedspace(self):
-    #     """
-    #     Returns the amount of used space on the connected device
-
-    #     @rtype: long
-    #     @return: The amount of used storage in bytes
-    #     """
-
-    #     if self.device is None:
-    #         raise NotConnected
-
-    #     self.mtp.LIBMTP_Get_Storage(self.device, 0)
-    #     storage = self.device.contents.storage.contents
-    #     return storage.MaxCapacity - storage.FreeSpaceInBytes
-
-    # def get_usedspace_percent(self):
-    #     """
-    #     Returns the amount of used space as a percentage
-
-    #     @rtype: float
-    #     @return: The percentage of used storage
-    #     """
-
-    #     if self.device is None:
-    #         raise NotConnected
-
-    #     self.mtp.LIBMTP_Get_Storage(self.device, 0)
-    #     storage = self.device.contents.storage.contents
-
-    #     # Why don't we call self.get_totalspace/self.get_usedspace
-    #     # here? That would require 3 *more* calls to
-    #     # LIBMTP_Get_Storage
-    #     usedspace = storage.MaxCapacity - storage.FreeSpaceInBytes
-    #     return (float(usedspace) / float(storage.MaxCapacity)) * 100
-
-    # def get_playlists(self):
-    #     """
-    #     Returns a tuple filled with L{LIBMTP_Playlist} objects
-    #     from the connected device.
-
-    #     The main gotcha of this function is that the tracks
-    #     variable of LIBMTP_Playlist isn't iterable (without
-    #     segfaults), so, you have to iterate over the no_tracks
-    #     (through range or xrange) and access it that way (i.e.
-    #     tracks[track_id]). Kind of sucks.
-
-    #     @rtype: tuple
-    #     @return: Tuple filled with LIBMTP_Playlist objects
-    #     """
-
-    #     if self.device is None:
-    #         raise NotConnected
-
-    #     playlists = self.mtp.LIBMTP_Get_Playlist_List(self.device)
-    #     ret = []
-    #     next = playlists
-
-    #     while next:
-    #         ret.append(next.contents)
-    #         if next.contents.next is None:
-    #             break
-    #         next = next.contents.next
-
-    #     return ret
-
-    # def get_playlist(self, playlist_id):
-    #     """
-    #     Returns a L{LIBMTP_Playlist} object of the requested
-    #     playlist_id from the connected device
-
-    #     @type playlist_id: int
-    #     @param playlist_id: The unique playlist identifier
-    #     @rtype: LIBMTP_Playlist
-    #     @return: The playlist object
-    #     """
-
-    #     if self.device is None:
-    #         raise NotConnected
-
-    #     try:
-    #         ret = self.mtp.LIBMTP_Get_Playlist(self.device, playlist_id).contents
-    #     except ValueError:
-    #         raise ObjectNotFound
-
-    #     return ret
-
-    # def create_new_playlist(self, metadata):
-    #     """
-    #     Creates a new playlist based on the metadata object
-    #     passed.
-
-    #     @type metadata: LIBMTP_Playlist
-    #     @param metadata: A LIBMTP_Playlist object describing
-    #      the playlist
-    #     @rtype: int
-    #     @return: The object ID of the new playlist
-    #     """
-
-    #     if self.device is None:
-    #         raise NotConnected
-
-    #     ret = self.mtp.LIBMTP_Create_New_Playlist(self.device, ctypes.pointer(metadata)) 
-
-    #     if ret != 0:
-    #         self.debug_stack()
-    #         raise CommandFailed
-
-    #     return metadata.playlist_id
-
-    # def update_playlist(self, metadata):
-    #     """
-    #     Updates a playlist based on the supplied metadata.
-
-    #     When updating the tracks field in a playlist, this
-    #     function will replace the playlist's tracks with
-    #     the tracks supplied in the metadata object. This
-    #     means that the previous tracks in the playlist
-    #     will be overwritten.
-
-    #     @type metadata: LIBMTP_Playlist
-    #     @param metadata: A LIBMTP_Playlist object describing
-    #      the updates to the playlist.
-    #     """
-
-    #     if self.device is None:
-    #         raise NotConnected
-
-    #     ret = self.mtp.LIBMTP_Update_Playlist(self.device, ctypes.pointer(metadata))
-
-    #     if ret != 0:
-    #         self.debug_stack()
-    #         raise CommandFailed
-
-    # def get_folder_list(self):
-    #     """
-    #     Returns a pythonic dict of the folders on the
-    #     device.
-
-    #     @rtype: dict
-    #     @return: A dict of the folders on the device where
-    #      the folder ID is the key.
-    #     """
-
-    #     if self.device is None:
-    #         raise NotConnected
-
-    #     folders = self.mtp.LIBMTP_Get_Folder_List(self.device)
-    #     next = folders
-    #     # List of folders, key being the folder ID
-    #     ret = {}
-    #     # Iterate over the folders to grab the first-level parents
-    #     while True:
-    #         next = next.contents
-    #         scanned = True
-
-    #         # Check if this ID exists, if not, add it
-    #         # and trigger a scan of the children
-    #         if next.folder_id not in ret:
-    #             ret[next.folder_id] = next
-    #             scanned = False
-
-    #         if (scanned == False) and (next.child):
-    #             ## Scan the children
-    #             next = next.child
-
-    #         elif next.sibling:
-    #             ## Scan the siblings
-    #             next = next.sibling
-
-    #         elif next.parent_id != 0:
-    #             ## If we have no children/siblings to visit,
-    #             ## and we aren't at the parent, go back to
-    #             ## the parent.
-    #             next = self.mtp.LIBMTP_Find_Folder(folders, int(next.parent_id))
-    #         else:
-    #             ## We have scanned everything, let's go home.
-    #             break
-
-    #     return ret
-
-    # def get_parent_folders(self):
-    #     """
-    #     Returns a list of only the parent folders.
-    #     @rtype: list
-    #     @return: Returns a list of the parent folders
-    #     """
-
-    #     if self.device is None:
-    #         raise NotConnected
-    #     folders = self.mtp.LIBMTP_Get_Folder_List(self.device)
-    #     next = folders
-    #     # A temporary holding space, this makes checking folder
-    #     # IDs easier
-    #     tmp = {}
-
-    #     while True:
-    #         next = next.contents
-    #         ## Check if this folder is in the dict
-    #         if next.folder_id not in tmp:
-    #             tmp[next.folder_id] = next
-
-    #         # Check for siblings
-    #         if next.sibling:
-    #             ## Scan the sibling
-    #             next = next.sibling
-    #         else:
-    #             ## We're done here.
-    #             break
-
-    #     ## convert the dict into a list
-    #     ret = []
-    #     for key in tmp:
-    #         ret.append(tmp[key])
-
-    #     return ret
-
     # def get_errorstack(self):
     #     """
     #     Returns the connected device's errorstack from
@@ -1345,91 +2313,3 @@ class MTP:
     #         raise CommandFailed
 
     #     return ret
-
-
-# class LIBMTP_Playlist(ctypes.Structure):
-#     """
-#     LIBMTP_Playlist
-#     Contains the ctypes structure for LIBMTP_playlist_t
-#     """
-
-#     def __init__(self):
-#         super().__init__()
-#         self.tracks = ctypes.pointer(ctypes.c_uint32(0))
-#         self.no_tracks = ctypes.c_uint32(0)
-
-#     def __repr__(self):
-#         return "%s (%s)" % (self.name, self.playlist_id)
-
-#     def __iter__(self):
-#         """
-#         This allows the playlist object to act like a list with
-#         a generator.
-#         """
-#         for track in range(self.no_tracks.value):
-#             yield self.tracks[track]
-
-#     def __getitem__(self, key):
-#         """
-#         This allows the playlist to return tracks like a list
-#         """
-
-#         if key > (self.no_tracks.value - 1):
-#             raise IndexError
-
-#         return self.tracks[key]
-
-#     def __setitem__(self, key, value):
-#         """
-#         This allows the user to manipulate the playlist like a
-#         list. However, this will only modify existing objects,
-#         you can't try to set a key outside of the current size.
-#         """
-
-#         if key > (self.no_tracks.value - 1):
-#             raise IndexError
-
-#         self.tracks[key] = value
-
-#     def __delitem__(self, key):
-#         """
-#         This allows the user to delete an object
-#         from the playlist
-#         """
-
-#         if key > (self.no_tracks.value - 1):
-#             raise IndexError
-
-#         for i in range(key, (self.no_tracks.value - 1)):
-#             self.tracks[i] = self.tracks[i + 1]
-
-#         self.no_tracks.value -= 1
-
-#     def append(self, value):
-#         """
-#         This function appends a track to the end of the tracks
-#         list.
-#         """
-#         if self.tracks is None:
-#             self.tracks = ctypes.pointer(ctypes.c_uint32(0))
-
-#         self.no_tracks.value += 1
-#         self.tracks[(self.no_tracks.value - 1)] = value
-
-#     def __len__(self):
-#         """
-#         This returns the number of tracks in the playlist
-#         """
-
-#         return self.no_tracks
-
-
-# LIBMTP_Playlist._fields_ = [
-#     ("playlist_id", ctypes.c_uint32),
-#     ("parent_id", ctypes.c_uint32),
-#     ("storage_id", ctypes.c_uint32),
-#     ("name", ctypes.c_char_p),
-#     ("tracks", ctypes.POINTER(ctypes.c_uint32)),
-#     ("no_tracks", ctypes.c_uint32),
-#     ("next", ctypes.POINTER(LIBMTP_Playlist)),
-# ]